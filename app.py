@@ -9,21 +9,113 @@ This application combines:
 - Your original recognition algorithm from Function.py
 """
 
-from flask import Flask, render_template_string, Response, jsonify
+from flask import Flask, render_template_string, Response, jsonify, request, session
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import cv2 as cv
 import mediapipe as mp
 import numpy as np
+from bisect import bisect_left
+from collections import deque
 import base64
+import json
+import os
+import queue
+import shutil
+import struct
+import threading
 import time
+import uuid
 
 app = Flask(__name__)
+# Signs the session cookie that identifies each client's TranslatorSession
+app.secret_key = os.environ.get('SECRET_KEY') or os.urandom(24)
+# The frame pipeline runs on plain OS threads and emits from them, so
+# Socket.IO uses the threading async mode rather than eventlet green threads
+socketio = SocketIO(app, async_mode='threading')
 
-# Global variables for video processing
-camera = None
-is_camera_active = False
-current_gesture = ""
-gesture_history = []
+# Per-session settings
 max_history = 50
+MAX_SESSIONS = int(os.environ.get('MAX_SESSIONS', 4))
+SESSION_IDLE_TIMEOUT = float(os.environ.get('SESSION_IDLE_TIMEOUT', 300))
+
+# Landmark distances for the rule engine: "float" compares squared float
+# distances, "compat" the integer-truncated pixel distances of the original
+# algorithm (see persons_input)
+FEATURE_MODE = os.environ.get('FEATURE_MODE', 'float')
+
+# Letter recognition: "rules" (GESTURE_RULES) or "learned", a LandmarkClassifier
+# made with train_classifier.py and loaded from CLASSIFIER_MODEL. It answers ""
+# for hands whose best letter is less likely than CLASSIFIER_MIN_CONFIDENCE
+CLASSIFIER = os.environ.get('CLASSIFIER', 'rules')
+CLASSIFIER_MODEL = os.environ.get('CLASSIFIER_MODEL', 'gesture_model.npz')
+CLASSIFIER_MIN_CONFIDENCE = float(os.environ.get('CLASSIFIER_MIN_CONFIDENCE', 0.5))
+
+# Letter stabilization (see GestureStabilizer)
+STABILIZER_WINDOW = int(os.environ.get('STABILIZER_WINDOW', 8))
+STABILIZER_MIN_HOLD = float(os.environ.get('STABILIZER_MIN_HOLD', 0.3))
+
+# Word assembly: one word per line, a pause this long (or the hand leaving
+# the frame) ends a word
+LEXICON_PATH = os.environ.get('LEXICON_PATH', '/usr/share/dict/words')
+WORD_GAP = float(os.environ.get('WORD_GAP', 1.5))
+
+# Per-session gesture logs are kept under HISTORY_DIR (empty disables them).
+# Set SECRET_KEY as well so session cookies, and so histories, survive restarts
+HISTORY_DIR = os.environ.get('HISTORY_DIR', 'gesture_logs')
+# Only the HISTORY_MAX_LOGS most recently written session logs are kept, and
+# none untouched for HISTORY_MAX_AGE days (0 disables either limit)
+HISTORY_MAX_LOGS = int(os.environ.get('HISTORY_MAX_LOGS', 100))
+HISTORY_MAX_AGE = float(os.environ.get('HISTORY_MAX_AGE', 30))
+
+# Where camera sessions get frames from, see open_source: a device index, a
+# video file or stream URL, a directory of images, or "synthetic". Files play
+# at their own frame rate unless FRAME_SOURCE_REALTIME is 0 (maximum speed)
+FRAME_SOURCE = os.environ.get('FRAME_SOURCE', '0')
+FRAME_SOURCE_REALTIME = os.environ.get('FRAME_SOURCE_REALTIME', '1') != '0'
+
+# With SHARED_CAMERA every browser uses one camera session (the default for a
+# local device, which can only be opened once). Without it each browser has
+# its own, and /?session=<id> attaches a browser to an existing one
+SHARED_CAMERA = os.environ.get('SHARED_CAMERA', '1' if FRAME_SOURCE.isdigit() else '0') != '0'
+
+# Camera frames are paced at TARGET_FPS. When processing can't keep up the
+# pipeline degrades step by step, the first step being DEGRADED_JPEG_QUALITY
+TARGET_FPS = float(os.environ.get('TARGET_FPS', 20))
+JPEG_QUALITY = int(os.environ.get('JPEG_QUALITY', 95))
+DEGRADED_JPEG_QUALITY = int(os.environ.get('DEGRADED_JPEG_QUALITY', 70))
+
+# Frame sizes (0 keeps the size as it is). The source is asked for
+# CAPTURE_WIDTH x CAPTURE_HEIGHT, MediaPipe sees frames shrunk to
+# INFERENCE_WIDTH and the video stream is encoded at OUTPUT_WIDTH, both
+# keeping the aspect ratio. Landmarks are always in capture coordinates.
+CAPTURE_WIDTH = int(os.environ.get('CAPTURE_WIDTH', 0))
+CAPTURE_HEIGHT = int(os.environ.get('CAPTURE_HEIGHT', 0))
+INFERENCE_WIDTH = int(os.environ.get('INFERENCE_WIDTH', 0))
+OUTPUT_WIDTH = int(os.environ.get('OUTPUT_WIDTH', 0))
+
+# Camera graphs track the hand between frames, running the landmark model on
+# the region around the previous hand only. Every ROI_REFRESH tracked frames
+# the whole frame is searched again (0 never forces a search)
+ROI_REFRESH = int(os.environ.get('ROI_REFRESH', 30))
+
+# Hands recognized per frame, each gets its own letter track. Every extra
+# hand costs one more landmark model run per frame, even while it is not in
+# view, so several hands are opt-in
+MAX_NUM_HANDS = int(os.environ.get('MAX_NUM_HANDS', 1))
+
+# Client-uploaded frames. Every uploading client gets a session of its own,
+# up to MAX_UPLOAD_SESSIONS, separate from the MAX_SESSIONS camera sessions
+UPLOAD_POOL_SIZE = int(os.environ.get('UPLOAD_POOL_SIZE', 2))
+MAX_UPLOAD_SESSIONS = int(os.environ.get('MAX_UPLOAD_SESSIONS', 64))
+
+# Camera sessions check a tracking graph out of a shared pool instead of
+# building one per start. HANDS_WARM graphs are created and run once at boot.
+CAMERA_POOL_SIZE = int(os.environ.get('CAMERA_POOL_SIZE', MAX_SESSIONS))
+HANDS_WARM = int(os.environ.get('HANDS_WARM', 2))
+app.config['MAX_CONTENT_LENGTH'] = 8 * 1024 * 1024
+
+# Stage latencies for /metrics: time every METRICS_SAMPLE-th call per stage
+METRICS_SAMPLE = int(os.environ.get('METRICS_SAMPLE', 1))
 
 # MediaPipe setup
 mp_hands = mp.solutions.hands # pyright: ignore[reportAttributeAccessIssue]
@@ -33,294 +125,2255 @@ mp_drawing = mp.solutions.drawing_utils # type: ignore
 # GESTURE RECOGNITION ENGINE (from your original Function.py)
 #==============================================================================
 
-def persons_input(hand_coordinates):
+# Finger-state code: one bit per finger flag of the original algorithm, so
+# every combination of hand_horz/thumbs_up/.../littel_up is a number 0-63
+HAND_HORZ = 1 << 5
+THUMBS_UP = 1 << 4
+INDEX_UP = 1 << 3
+MIDDEL_UP = 1 << 2
+RING_UP = 1 << 1
+LITTEL_UP = 1 << 0
+
+def closer(a, b, c, d, scale=1):
+    """Refinement predicate: scale * distance(a, b) < distance(c, d)"""
+    return ('closer', a, b, c, d, scale)
+
+def left_of(a, b):
+    """Refinement predicate: landmark a has a smaller X than landmark b"""
+    return ('left_of', a, b)
+
+# For every finger-state code, the refinement rules checked in order. A rule
+# is (predicates, letter) and matches when all of its predicates hold, so a
+# rule with no predicates is the "else" of its group. Codes that are missing,
+# or whose rules all fail, give "". New letters only need a new entry here.
+GESTURE_RULES = {
+    THUMBS_UP: [
+        ([closer(4, 16, 4, 13)], " O"),
+        ([closer(4, 18, 14, 18)], " M"),
+        ([closer(4, 18, 10, 18)], " N"),
+        ([closer(4, 18, 6, 18)], " T"),
+        ([], " A"),
+    ],
+    INDEX_UP | MIDDEL_UP | RING_UP | LITTEL_UP | THUMBS_UP: [
+        ([closer(4, 12, 4, 11)], " C"),
+        ([closer(4, 17, 4, 5)], " B"),
+    ],
+    0: [
+        ([closer(20, 4, 19, 4)], " E"),
+        ([], " S"),
+    ],
+    MIDDEL_UP | RING_UP | LITTEL_UP | THUMBS_UP: [
+        ([], " F"),
+    ],
+    INDEX_UP | THUMBS_UP | HAND_HORZ: [
+        ([closer(8, 4, 6, 4)], " Q"),
+        ([closer(12, 4, 10, 4)], " P"),
+        ([], " G"),
+    ],
+    INDEX_UP | MIDDEL_UP | THUMBS_UP | HAND_HORZ: [
+        ([closer(12, 4, 10, 4)], " P"),
+        ([], " H"),
+    ],
+    LITTEL_UP: [
+        ([], " I"),
+    ],
+    LITTEL_UP | HAND_HORZ: [
+        ([], " J"),
+    ],
+    INDEX_UP | MIDDEL_UP | THUMBS_UP: [
+        ([left_of(8, 12)], " R"),
+        ([closer(4, 14, 9, 14), closer(5, 9, 8, 12, scale=2)], " V"),
+        ([closer(4, 14, 9, 14)], " U"),
+        ([closer(4, 14, 5, 14)], " K"),
+    ],
+    INDEX_UP | THUMBS_UP: [
+        ([closer(3, 14, 14, 4)], " L"),
+        ([closer(8, 10, 6, 10)], " X"),
+        ([], " D"),
+    ],
+    INDEX_UP | MIDDEL_UP: [
+        ([left_of(8, 12)], " R"),
+        ([closer(5, 9, 8, 12, scale=2)], " V"),
+        ([], " U"),
+    ],
+    INDEX_UP | MIDDEL_UP | RING_UP | THUMBS_UP: [
+        ([], " W"),
+    ],
+    LITTEL_UP | THUMBS_UP: [
+        ([closer(3, 18, 4, 18)], " Y"),
+        ([], " I"),
+    ],
+}
+
+def compile_gesture_table(rules):
+    """
+    Flatten a rules dict into a list indexed directly by finger-state code
+    """
+    table = [() for _ in range(64)]
+    for code, code_rules in rules.items():
+        table[code] = tuple((tuple(predicates), letter) for predicates, letter in code_rules)
+    return table
+
+GESTURE_TABLE = compile_gesture_table(GESTURE_RULES)
+
+def persons_input(hand_coordinates, mode=FEATURE_MODE):
     """
     Core gesture recognition function - your original algorithm
+
+    The finger flags are packed into a 6-bit code which indexes GESTURE_TABLE,
+    then only that code's refinement rules are checked. In "compat" mode the
+    distances are truncated to whole pixels as originally; otherwise squared
+    float distances are compared, which order the same without the sqrt.
     """
-    def distance(x1,y1,x2,y2):
-        distance=int((((x1-x2)**2)+((y1-y2)**2))**(1/2))
-        return distance
-    
-    persons_input=""
-    
-    # Consider pawn is Vertical
-    hand_horz=False
-    
-    # Consider all fingure are Down
-    thumbs_up=False
-    index_up=False
-    middel_up=False
-    ring_up=False
-    littel_up=False
-    
     # Here I am using Hand Cordinates(HC) values , which we got from video input.
     # With the help of HC values , I can determine wither the fingure is UP or DOWN
     # In "hand_cordinate[12][1]" , "12" is the index and "1" is X_cordinate (and "2" for Y_cordinate) 
     # For more information, refer the "HAND_CORD" image (to understand the HC)
+    hand_coordinates = np.asarray(hand_coordinates)
+    xs = hand_coordinates[:, 1].tolist()
+    ys = hand_coordinates[:, 2].tolist()
+
+    wrist_x = xs[0]
+    wrist_y = ys[0]
+
+    if mode == 'compat':
+        power = 1
+
+        def distance(a, b):
+            return int((((xs[a]-xs[b])**2)+((ys[a]-ys[b])**2))**(1/2))
+
+        def wrist_distance(a):
+            return int((((wrist_x-xs[a])**2)+((wrist_y-ys[a])**2))**(1/2))
+
+        horizontal = int(((wrist_y-ys[12])**2)**(1/2)) < int(((wrist_x-xs[12])**2)**(1/2))
+    else:
+        # Every test compares two distances of the same hand, so the result
+        # does not depend on the hand's size in pixels
+        power = 2
+
+        def distance(a, b):
+            dx = xs[a] - xs[b]
+            dy = ys[a] - ys[b]
+            return dx*dx + dy*dy
+
+        def wrist_distance(a):
+            dx = wrist_x - xs[a]
+            dy = wrist_y - ys[a]
+            return dx*dx + dy*dy
+
+        horizontal = abs(wrist_y-ys[12]) < abs(wrist_x-xs[12])
+
+    code = 0
+    if horizontal:
+        code |= HAND_HORZ
+    if wrist_distance(3) < wrist_distance(4):
+        code |= THUMBS_UP
+    if wrist_distance(6) < wrist_distance(8):
+        code |= INDEX_UP
+    if wrist_distance(10) < wrist_distance(12):
+        code |= MIDDEL_UP
+    if wrist_distance(14) < wrist_distance(16):
+        code |= RING_UP
+    if wrist_distance(18) < wrist_distance(20):
+        code |= LITTEL_UP
+
+    for predicates, letter in GESTURE_TABLE[code]:
+        for predicate in predicates:
+            if predicate[0] == 'left_of':
+                if not xs[predicate[1]] < xs[predicate[2]]:
+                    break
+            elif not predicate[5]**power*distance(predicate[1], predicate[2]) < distance(predicate[3], predicate[4]):
+                break
+        else:
+            return letter
+    return ""
+
+def classify_batch(landmarks, mode=FEATURE_MODE):
+    """
+    Vectorized persons_input over many hands at once.
+
+    landmarks is an (N, 21, 2) array of pixel (x, y) coordinates (the
+    hand_coordinate array without its index column). Returns a list of N
+    letters, identical to calling persons_input on each hand in the same
+    mode.
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    if landmarks.ndim == 2:
+        landmarks = landmarks[np.newaxis]
+    if mode == 'compat':
+        power = 1
+
+        def measure(dx, dy):
+            return np.trunc(np.sqrt(dx*dx + dy*dy))
+    else:
+        power = 2
+
+        def measure(dx, dy):
+            return dx*dx + dy*dy
+    x = landmarks[:, :, 0]
+    y = landmarks[:, :, 1]
+    cache = {}
+
+    def distance(a, b):
+        key = (a, b) if a < b else (b, a)
+        if key not in cache:
+            cache[key] = measure(x[:, a] - x[:, b], y[:, a] - y[:, b])
+        return cache[key]
+
+    def axis_distance(values, a, b):
+        return measure(values[:, a] - values[:, b], 0)
+
+    # Same finger tests as persons_input, packed into the same 6-bit code
+    codes = ((axis_distance(y, 0, 12) < axis_distance(x, 0, 12)) * HAND_HORZ +
+             (distance(0, 3) < distance(0, 4)) * THUMBS_UP +
+             (distance(0, 6) < distance(0, 8)) * INDEX_UP +
+             (distance(0, 10) < distance(0, 12)) * MIDDEL_UP +
+             (distance(0, 14) < distance(0, 16)) * RING_UP +
+             (distance(0, 18) < distance(0, 20)) * LITTEL_UP)
+
+    def holds(predicate):
+        if predicate[0] == 'left_of':
+            return x[:, predicate[1]] < x[:, predicate[2]]
+        return predicate[5]**power*distance(predicate[1], predicate[2]) < distance(predicate[3], predicate[4])
+
+    letters = np.full(len(landmarks), "", dtype=object)
+    for code in np.unique(codes):
+        pending = codes == code
+        for predicates, letter in GESTURE_TABLE[code]:
+            matched = pending.copy()
+            for predicate in predicates:
+                matched &= holds(predicate)
+            letters[matched] = letter
+            pending &= ~matched
+    return letters.tolist()
+
+# Palm size: wrist to the knuckle of the middle finger
+PALM = (0, 9)
+
+def hand_features(landmarks):
+    """
+    LandmarkClassifier inputs: (N, 21, 2) pixel landmarks as float offsets
+    from the wrist in palm lengths, so a hand shape gives the same features
+    at any camera resolution or distance from the camera
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    if landmarks.ndim == 2:
+        landmarks = landmarks[np.newaxis]
+    features = landmarks - landmarks[:, :1]
+    palm = np.hypot(*(features[:, PALM[1]] - features[:, PALM[0]]).T)
+    palm[palm == 0] = 1
+    features /= palm[:, np.newaxis, np.newaxis]
+    return features
+
+class LandmarkClassifier:
+    """
+    Learned alternative to the rule engine: a small MLP (one ReLU hidden
+    layer, softmax output) over hand_features, in plain NumPy. It is made
+    with train() from labelled landmarks and saved as an .npz file. Letters
+    include "" when the training data had hands without a letter.
+    """
+    def __init__(self, letters, mean, std, w1, b1, w2, b2, min_confidence=0.5):
+        self.letters = list(letters)
+        self.mean = mean.astype(np.float32)
+        self.std = std.astype(np.float32)
+        self.w1 = w1.astype(np.float32)
+        self.b1 = b1.astype(np.float32)
+        self.w2 = w2.astype(np.float32)
+        self.b2 = b2.astype(np.float32)
+        self.min_confidence = min_confidence
+        # Answers in classify_batch's format
+        self.answers = [f" {letter}" if letter else "" for letter in self.letters]
+    
+    @staticmethod
+    def inputs(landmarks):
+        """
+        (N, 60) network inputs: hand_features without the wrist, which is
+        always 0, and the squared distance of every other landmark to it
+        """
+        features = hand_features(landmarks)[:, 1:]
+        return np.concatenate([features.reshape(len(features), -1), (features * features).sum(axis=2)], axis=1)
+    
+    def probabilities(self, landmarks):
+        """(N, letters) probabilities for (N, 21, 2) pixel landmarks"""
+        x = (self.inputs(landmarks).astype(np.float32) - self.mean) / self.std
+        logits = np.maximum(x @ self.w1 + self.b1, 0) @ self.w2 + self.b2
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
     
-    if distance(hand_coordinates[0][2],0,hand_coordinates[12][2],0) < distance(hand_coordinates[0][1],0,hand_coordinates[12][1],0):
-        hand_horz=True
-    if distance(hand_coordinates[0][1],hand_coordinates[0][2],hand_coordinates[3][1],hand_coordinates[3][2]) < distance(hand_coordinates[0][1],hand_coordinates[0][2],hand_coordinates[4][1],hand_coordinates[4][2]):
-        thumbs_up=True  
-    if distance(hand_coordinates[0][1],hand_coordinates[0][2],hand_coordinates[6][1],hand_coordinates[6][2]) < distance(hand_coordinates[0][1],hand_coordinates[0][2],hand_coordinates[8][1],hand_coordinates[8][2]):
-        index_up=True
-    if distance(hand_coordinates[0][1],hand_coordinates[0][2],hand_coordinates[10][1],hand_coordinates[10][2]) < distance(hand_coordinates[0][1],hand_coordinates[0][2],hand_coordinates[12][1],hand_coordinates[12][2]):
-        middel_up=True
-    if distance(hand_coordinates[0][1],hand_coordinates[0][2],hand_coordinates[14][1],hand_coordinates[14][2]) < distance(hand_coordinates[0][1],hand_coordinates[0][2],hand_coordinates[16][1],hand_coordinates[16][2]):
-        ring_up=True
-    if distance(hand_coordinates[0][1],hand_coordinates[0][2],hand_coordinates[18][1],hand_coordinates[18][2]) < distance(hand_coordinates[0][1],hand_coordinates[0][2],hand_coordinates[20][1],hand_coordinates[20][2]):
-        littel_up=True
+    def classify(self, landmarks):
+        """Letters for (N, 21, 2) pixel landmarks, in the format of classify_batch"""
+        probabilities = self.probabilities(landmarks)
+        best = probabilities.argmax(axis=1)
+        confident = probabilities[np.arange(len(best)), best] >= self.min_confidence
+        return [self.answers[index] if sure else "" for index, sure in zip(best.tolist(), confident.tolist())]
+    
+    @classmethod
+    def train(cls, landmarks, letters, hidden=64, epochs=200, learning_rate=0.005,
+              batch_size=128, seed=0, min_confidence=0.5):
+        """
+        Fit to (N, 21, 2) pixel landmarks and their N letters ("" for no
+        letter) by minimizing cross-entropy with Adam on mini-batches
+        """
+        rng = np.random.default_rng(seed)
+        x = cls.inputs(landmarks)
+        mean = x.mean(axis=0)
+        std = x.std(axis=0) + 1e-6
+        x = (x - mean) / std
+        names = sorted(set(letters))
+        y = np.searchsorted(names, letters)
         
-    # Get persons_input according to HC values
-    
-    if index_up==False and middel_up==False and ring_up==False and littel_up==False and thumbs_up==True and hand_horz==False:
-        if distance(hand_coordinates[4][1],hand_coordinates[4][2],hand_coordinates[16][1],hand_coordinates[16][2]) < distance(hand_coordinates[4][1],hand_coordinates[4][2],hand_coordinates[13][1],hand_coordinates[13][2]):
-            persons_input=" O"
-        elif distance(hand_coordinates[4][1],hand_coordinates[4][2],hand_coordinates[18][1],hand_coordinates[18][2]) < distance(hand_coordinates[14][1],hand_coordinates[14][2],hand_coordinates[18][1],hand_coordinates[18][2]):
-            persons_input=" M"
-        elif distance(hand_coordinates[4][1],hand_coordinates[4][2],hand_coordinates[18][1],hand_coordinates[18][2]) < distance(hand_coordinates[10][1],hand_coordinates[10][2],hand_coordinates[18][1],hand_coordinates[18][2]):
-            persons_input=" N"
-        elif distance(hand_coordinates[4][1],hand_coordinates[4][2],hand_coordinates[18][1],hand_coordinates[18][2]) < distance(hand_coordinates[6][1],hand_coordinates[6][2],hand_coordinates[18][1],hand_coordinates[18][2]):
-            persons_input=" T"
-        else :
-            persons_input=" A"
-    elif index_up==True and middel_up==True and ring_up==True and littel_up==True and thumbs_up==True and hand_horz==False:
-        if distance(hand_coordinates[4][1],hand_coordinates[4][2],hand_coordinates[12][1],hand_coordinates[12][2]) < distance(hand_coordinates[4][1],hand_coordinates[4][2],hand_coordinates[11][1],hand_coordinates[11][2]):
-            persons_input=" C"
-        elif distance(hand_coordinates[4][1],hand_coordinates[4][2],hand_coordinates[17][1],hand_coordinates[17][2]) < distance(hand_coordinates[4][1],hand_coordinates[4][2],hand_coordinates[5][1],hand_coordinates[5][2]):
-            persons_input=" B"
-    elif index_up==False and middel_up==False and ring_up==False and littel_up==False and thumbs_up==False and hand_horz==False:
-        if distance(hand_coordinates[20][1],hand_coordinates[20][2],hand_coordinates[4][1],hand_coordinates[4][2]) < distance(hand_coordinates[19][1],hand_coordinates[19][2],hand_coordinates[4][1],hand_coordinates[4][2]):
-            persons_input=" E"
-        else:
-            persons_input=" S"
-    elif index_up==False and middel_up==True and ring_up==True and littel_up==True and thumbs_up==True and hand_horz==False:
-        persons_input=" F"
-    elif index_up==True and middel_up==False and ring_up==False and littel_up==False and thumbs_up==True and hand_horz==True:
-        if distance(hand_coordinates[8][1],hand_coordinates[8][2],hand_coordinates[4][1],hand_coordinates[4][2]) < distance(hand_coordinates[6][1],hand_coordinates[6][2],hand_coordinates[4][1],hand_coordinates[4][2]):
-            persons_input=" Q"
-        elif distance(hand_coordinates[12][1],hand_coordinates[12][2],hand_coordinates[4][1],hand_coordinates[4][2]) < distance(hand_coordinates[10][1],hand_coordinates[10][2],hand_coordinates[4][1],hand_coordinates[4][2]):
-            persons_input=" P"
-        else:
-            persons_input=" G"
-    elif index_up==True and middel_up==True and ring_up==False and littel_up==False and thumbs_up==True and hand_horz==True:
-        if distance(hand_coordinates[12][1],hand_coordinates[12][2],hand_coordinates[4][1],hand_coordinates[4][2]) < distance(hand_coordinates[10][1],hand_coordinates[10][2],hand_coordinates[4][1],hand_coordinates[4][2]):
-            persons_input=" P"
-        else:
-            persons_input=" H"
-    elif index_up==False and middel_up==False and ring_up==False and littel_up==True and thumbs_up==False and hand_horz==False:
-        persons_input=" I"
-    elif index_up==False and middel_up==False and ring_up==False and littel_up==True and thumbs_up==False and hand_horz==True:
-        persons_input=" J"
-    elif index_up==True and middel_up==True and ring_up==False and littel_up==False and thumbs_up==True and hand_horz==False:
-        if hand_coordinates[8][1] < hand_coordinates[12][1]:
-            persons_input=" R"
-        elif distance(hand_coordinates[4][1],hand_coordinates[4][2],hand_coordinates[14][1],hand_coordinates[14][2]) < distance(hand_coordinates[9][1],hand_coordinates[9][2],hand_coordinates[14][1],hand_coordinates[14][2]):
-            if 2*distance(hand_coordinates[5][1],hand_coordinates[5][2],hand_coordinates[9][1],hand_coordinates[9][2]) < distance(hand_coordinates[8][1],hand_coordinates[8][2],hand_coordinates[12][1],hand_coordinates[12][2]):
-                persons_input=" V"
-            else:
-                persons_input=" U"
-        elif distance(hand_coordinates[4][1],hand_coordinates[4][2],hand_coordinates[14][1],hand_coordinates[14][2]) < distance(hand_coordinates[5][1],hand_coordinates[5][2],hand_coordinates[14][1],hand_coordinates[14][2]):
-            persons_input=" K"
-    elif index_up==True and middel_up==False and ring_up==False and littel_up==False and thumbs_up==True and hand_horz==False:
-        if distance(hand_coordinates[3][1],hand_coordinates[3][2],hand_coordinates[14][1],hand_coordinates[14][2]) < distance(hand_coordinates[14][1],hand_coordinates[14][2],hand_coordinates[4][1],hand_coordinates[4][2]):
-            persons_input=" L"
-        elif distance(hand_coordinates[8][1],hand_coordinates[8][2],hand_coordinates[10][1],hand_coordinates[10][2]) < distance(hand_coordinates[6][1],hand_coordinates[6][2],hand_coordinates[10][1],hand_coordinates[10][2]):
-            persons_input=" X"
-        else:
-            persons_input=" D"
-    elif index_up==True and middel_up==True and ring_up==False and littel_up==False and thumbs_up==False and hand_horz==False:
-        if hand_coordinates[8][1] < hand_coordinates[12][1]:
-            persons_input=" R"
-        elif 2*distance(hand_coordinates[5][1],hand_coordinates[5][2],hand_coordinates[9][1],hand_coordinates[9][2]) < distance(hand_coordinates[8][1],hand_coordinates[8][2],hand_coordinates[12][1],hand_coordinates[12][2]):
-            persons_input=" V"
-        else:
-            persons_input=" U"
-    elif index_up==True and middel_up==True and ring_up==True and littel_up==False and thumbs_up==True and hand_horz==False:
-        persons_input=" W"
-    elif index_up==False and middel_up==False and ring_up==False and littel_up==True and thumbs_up==True and hand_horz==False:
-        if distance(hand_coordinates[3][1],hand_coordinates[3][2],hand_coordinates[18][1],hand_coordinates[18][2]) < distance(hand_coordinates[4][1],hand_coordinates[4][2],hand_coordinates[18][1],hand_coordinates[18][2]):
-            persons_input=" Y"
-        else:
-            persons_input=" I"
+        weights = [rng.normal(0, np.sqrt(2 / x.shape[1]), (x.shape[1], hidden)), np.zeros(hidden),
+                   rng.normal(0, np.sqrt(2 / hidden), (hidden, len(names))), np.zeros(len(names))]
+        moments = [np.zeros_like(weight) for weight in weights]
+        squares = [np.zeros_like(weight) for weight in weights]
+        step = 0
+        for _ in range(epochs):
+            order = rng.permutation(len(x))
+            for start in range(0, len(x), batch_size):
+                batch = order[start:start + batch_size]
+                w1, b1, w2, b2 = weights
+                hidden_in = x[batch] @ w1 + b1
+                hidden_out = np.maximum(hidden_in, 0)
+                logits = hidden_out @ w2 + b2
+                logits -= logits.max(axis=1, keepdims=True)
+                error = np.exp(logits)
+                error /= error.sum(axis=1, keepdims=True)
+                error[np.arange(len(batch)), y[batch]] -= 1
+                error /= len(batch)
+                hidden_error = (error @ w2.T) * (hidden_in > 0)
+                gradients = [x[batch].T @ hidden_error, hidden_error.sum(axis=0),
+                             hidden_out.T @ error, error.sum(axis=0)]
+                step += 1
+                for weight, gradient, moment, square in zip(weights, gradients, moments, squares):
+                    moment += 0.1 * (gradient - moment)
+                    square += 0.001 * (gradient * gradient - square)
+                    weight -= (learning_rate * moment / (1 - 0.9 ** step) /
+                               (np.sqrt(square / (1 - 0.999 ** step)) + 1e-8))
+        return cls(names, mean, std, *weights, min_confidence=min_confidence)
+    
+    def save(self, path):
+        np.savez_compressed(path, letters=np.array(self.letters), mean=self.mean, std=self.std,
+                            w1=self.w1, b1=self.b1, w2=self.w2, b2=self.b2)
+    
+    @classmethod
+    def load(cls, path, min_confidence=0.5):
+        with np.load(path) as model:
+            return cls(model['letters'].tolist(), model['mean'], model['std'], model['w1'],
+                       model['b1'], model['w2'], model['b2'], min_confidence)
+
+def load_classifier():
+    """The LandmarkClassifier CLASSIFIER asks for, or None for the rule engine"""
+    if CLASSIFIER != 'learned':
+        return None
+    try:
+        model = LandmarkClassifier.load(CLASSIFIER_MODEL, CLASSIFIER_MIN_CONFIDENCE)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Warning: Could not load {CLASSIFIER_MODEL} ({e}), using the rule engine")
+        return None
+    print(f"Using the learned classifier from {CLASSIFIER_MODEL}")
+    return model
+
+learned_classifier = load_classifier()
+
+def classify_hands(landmarks):
+    """Letters for (N, 21, 2) landmarks from the learned classifier if loaded, else the rules"""
+    if learned_classifier is not None:
+        return learned_classifier.classify(landmarks)
+    return classify_batch(landmarks)
+
+#==============================================================================
+# GESTURE STABILIZATION
+#==============================================================================
+
+class GestureStabilizer:
+    """
+    Turns the per-frame letter stream into committed letters so single-frame
+    flicker (U/V/R, M/N/T, ...) never reaches the history. A letter is
+    committed once it fills enter_ratio of the last `window` frames for at
+    least min_hold seconds, and the committed letter is kept as long as it
+    still fills exit_ratio of the window (hysteresis). "" (no hand) is voted
+    on like any letter. Each update is O(1).
+    """
+    def __init__(self, window=8, min_hold=0.3, enter_ratio=0.6, exit_ratio=0.4):
+        self.frames = deque(maxlen=window)
+        self.counts = {}
+        self.min_hold = min_hold
+        self.enter_count = enter_ratio * window
+        self.exit_count = exit_ratio * window
+        self.letter = ""
+        self.candidate = None
+        self.candidate_since = 0.0
+    
+    def update(self, gesture, now=None):
+        """Feed one frame's letter, returns the letter it commits or None"""
+        now = time.monotonic() if now is None else now
+        if len(self.frames) == self.frames.maxlen:
+            self.counts[self.frames[0]] -= 1
+        self.frames.append(gesture)
+        self.counts[gesture] = self.counts.get(gesture, 0) + 1
+        # A candidate that fell below the threshold has to hold it anew
+        if self.candidate is not None and self.counts.get(self.candidate, 0) < self.enter_count:
+            self.candidate = None
         
-    return persons_input
+        # Only the letter that just gained a vote can have crossed the threshold
+        if gesture == self.letter or self.counts[gesture] < self.enter_count:
+            return None
+        if self.counts.get(self.letter, 0) >= self.exit_count:
+            return None
+        if gesture != self.candidate:
+            self.candidate = gesture
+            self.candidate_since = now
+        if now - self.candidate_since < self.min_hold:
+            return None
+        self.letter = gesture
+        self.candidate = None
+        return gesture
+    
+    def confidence(self, letter=None):
+        """Share of the window voting for letter (default: the committed one)"""
+        if not self.frames:
+            return 0.0
+        return self.counts.get(self.letter if letter is None else letter, 0) / len(self.frames)
+    
+    def confidences(self):
+        """Share of the window for every letter currently in it"""
+        total = len(self.frames)
+        return {letter: count / total for letter, count in self.counts.items() if count}
+
+#==============================================================================
+# WORD ASSEMBLY
+#==============================================================================
+
+# Groups of letters persons_input is known to mix up: a signed letter may
+# stand for any other letter of its group when matching words
+CONFUSABLE_LETTERS = ['UVR', 'MNT', 'IJ', 'PGQ', 'ES']
+CONFUSIONS = {}
+for group in CONFUSABLE_LETTERS:
+    for letter in group:
+        others = CONFUSIONS.get(letter, letter)
+        CONFUSIONS[letter] = others + ''.join(c for c in group if c not in others)
+
+class Lexicon:
+    """
+    Sorted upper-case word list used as a trie: a node is the (lo, hi) range
+    of words sharing a prefix and a child is found by bisecting inside it, so
+    nothing needs to be built beyond the list. The file is read on first use.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._words = None
+        self.lock = threading.Lock()
+    
+    @property
+    def words(self):
+        if self._words is None:
+            with self.lock:
+                if self._words is None:
+                    self._words = self._load()
+        return self._words
+    
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            print(f"Warning: lexicon {self.path} not found, words will not be corrected")
+            return []
+        with open(self.path, encoding='utf-8', errors='ignore') as f:
+            words = {line.strip().upper() for line in f}
+        words = sorted(word for word in words if word.isascii() and word.isalpha())
+        print(f"Lexicon loaded: {len(words)} words from {self.path}")
+        return words
+    
+    def root(self):
+        return (0, len(self.words))
+    
+    def child(self, node, prefix):
+        """Range of words starting with prefix, searched within node's range"""
+        lo, hi = node
+        start = bisect_left(self.words, prefix, lo, hi)
+        # "\x7f" sorts after every letter, so this is the end of the prefix
+        end = bisect_left(self.words, prefix + "\x7f", start, hi)
+        return (start, end)
+    
+    def is_word(self, node, prefix):
+        lo, hi = node
+        return lo < hi and self.words[lo] == prefix
+
+class WordAssembler:
+    """
+    Groups committed letters into words. Each letter extends a small beam of
+    prefix hypotheses through the Lexicon, where a hypothesis may replace the
+    letter by a confusable one at a cost of one substitution, so a letter
+    costs a handful of bisections. end_word() returns the cheapest complete
+    word, or the letters as signed when no word fits.
+    """
+    def __init__(self, lexicon, beam=16, max_substitutions=2):
+        self.lexicon = lexicon
+        self.beam = beam
+        self.max_substitutions = max_substitutions
+        self.letters = []
+        self.hypotheses = []
+    
+    def add_letter(self, letter):
+        if not self.letters:
+            self.hypotheses = [("", 0, self.lexicon.root())]
+        self.letters.append(letter)
+        
+        extended = []
+        for prefix, cost, node in self.hypotheses:
+            for candidate in CONFUSIONS.get(letter, letter):
+                candidate_cost = cost + (candidate != letter)
+                if candidate_cost > self.max_substitutions:
+                    continue
+                child = self.lexicon.child(node, prefix + candidate)
+                if child[0] < child[1]:
+                    extended.append((prefix + candidate, candidate_cost, child))
+        extended.sort(key=lambda hypothesis: hypothesis[1])
+        self.hypotheses = extended[:self.beam]
+    
+    @property
+    def partial(self):
+        return "".join(self.letters)
+    
+    def candidates(self, limit=5):
+        """Complete words matching the letters so far, cheapest first"""
+        words = [prefix for prefix, cost, node in self.hypotheses
+                 if self.lexicon.is_word(node, prefix)]
+        return words[:limit]
+    
+    def end_word(self):
+        """Finish the current word and return it, None if it had no letters"""
+        if not self.letters:
+            return None
+        matches = self.candidates(1)
+        word = matches[0] if matches else self.partial
+        self.letters = []
+        self.hypotheses = []
+        return word
+
+lexicon = Lexicon(LEXICON_PATH)
+
+#==============================================================================
+# METRICS
+#==============================================================================
+
+class Histogram:
+    """
+    Latency histogram over fixed buckets (seconds). observe() is a bisect and
+    three additions, cheap enough for every frame. Quantiles are interpolated
+    inside a bucket, so they are only as precise as the bucket spacing.
+    """
+    # 0.1 ms to 2.5 s in steps of 1.5x, a quantile is somewhere in its bucket
+    BUCKETS = tuple(round(0.0001 * 1.5 ** i, 6) for i in range(26))
+    
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, seconds):
+        self.counts[bisect_left(self.BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+    
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.BUCKETS[i - 1] if i else 0.0
+                if i == len(self.BUCKETS):
+                    # Past the last bucket there is no upper bound to go by
+                    return lower
+                return lower + (self.BUCKETS[i] - lower) * (rank - seen) / count
+            seen += count
+
+class Metrics:
+    """
+    Process-wide stage latency histograms and event counters, rendered in
+    the Prometheus text format for /metrics. Only every sample_every-th
+    call of a stage is timed, counters are always exact.
+    
+        start = metrics.start('encode')
+        ...
+        metrics.observe('encode', start)
+    """
+    QUANTILES = (0.5, 0.95, 0.99)
+    HELP = {
+        'signlang_frames_total': "Camera frames that made it through classification",
+        'signlang_frames_dropped_total': "Frames replaced before the next stage or viewer took them",
+        'signlang_errors_total': "Errors by where they happened"
+    }
+    
+    def __init__(self, sample_every=1):
+        self.sample_every = max(1, sample_every)
+        self.histograms = {}
+        self.calls = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+    
+    def start(self, stage):
+        """perf_counter() to hand to observe(), None if this call isn't sampled"""
+        if self.sample_every > 1:
+            calls = self.calls.get(stage, 0) + 1
+            self.calls[stage] = calls
+            if calls % self.sample_every:
+                return None
+        return time.perf_counter()
+    
+    def observe(self, stage, start):
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.observe(elapsed)
+    
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+    
+    def render(self, gauges):
+        """
+        Text exposition of everything recorded, plus gauges: a list of
+        (name, help, {labels tuple: value}) read at scrape time
+        """
+        lines = []
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+            
+            lines.append("# HELP signlang_stage_seconds Time spent in each frame processing stage")
+            lines.append("# TYPE signlang_stage_seconds histogram")
+            for stage, histogram in histograms:
+                cumulative = 0
+                for bound, count in zip(Histogram.BUCKETS + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'signlang_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'signlang_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'signlang_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            
+            lines.append("# HELP signlang_stage_quantile_seconds Stage time quantiles estimated from the histogram")
+            lines.append("# TYPE signlang_stage_quantile_seconds gauge")
+            for stage, histogram in histograms:
+                for q in self.QUANTILES:
+                    value = histogram.quantile(q)
+                    if value is not None:
+                        lines.append(f'signlang_stage_quantile_seconds{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+        
+        for name in sorted({name for (name, _), _ in counters}):
+            if name in self.HELP:
+                lines.append(f"# HELP {name} {self.HELP[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for (counter, labels), value in counters:
+                if counter == name:
+                    lines.append(f"{name}{self._labels(labels)} {value}")
+        for name, help_text, values in gauges:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in values.items():
+                lines.append(f"{name}{self._labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+    
+    @staticmethod
+    def _labels(labels):
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+metrics = Metrics(METRICS_SAMPLE)
+
+#==============================================================================
+# MEDIAPIPE HANDS POOL
+#==============================================================================
+
+def classify_results(results, img_w, img_h, wrists=None):
+    """
+    Classify every hand in MediaPipe hand results with one classify_hands
+    call. Returns (gesture, hands) where hands is a list of (hand_landmarks,
+    hand_coordinate, gesture, handedness) for every detected hand and
+    gesture is the one of the last hand. wrists is passed on to handedness.
+    """
+    if not results or not results.multi_hand_landmarks:
+        return "", []
+    
+    # Extract coordinates, truncated to pixels like int() for drawing and
+    # history. Only "compat" recognition uses the truncated ones.
+    points = np.array([[(landmark.x, landmark.y) for landmark in hand_landmarks.landmark]
+                       for hand_landmarks in results.multi_hand_landmarks]) * (img_w, img_h)
+    pixels = points.astype(np.int64)
+    index = np.broadcast_to(np.arange(21)[np.newaxis, :, np.newaxis], (len(pixels), 21, 1))
+    hand_coordinates = np.concatenate([index, pixels], axis=2)
+    
+    gestures = [gesture.strip() for gesture in classify_hands(pixels if FEATURE_MODE == 'compat' else points)]
+    hands = list(zip(results.multi_hand_landmarks, hand_coordinates, gestures, handedness(results, wrists)))
+    return gestures[-1], hands
+
+def handedness(results, wrists=None):
+    """
+    A label for every hand in results: 'left' or 'right' from MediaPipe's
+    handedness, which it gives for a mirrored selfie image while frames here
+    are processed unmirrored, so its labels are swapped. Further hands with
+    the same label (two people at one camera) are numbered: 'right', 'right2', ...
+    
+    Letters are tracked per label, but MediaPipe's order of hands and now and
+    then its handedness change from frame to frame. wrists, a dict of
+    {label: normalized wrist (x, y)} from the previous frame of the same
+    source, keeps labels with the hands: hands take the label of the nearest
+    previous wrist whatever MediaPipe calls them, handedness only breaking
+    ties and naming new hands. So with MAX_NUM_HANDS = 1 the hand keeps the
+    label it was first given. wrists is updated for the next frame.
+    """
+    previous = wrists or {}
+    bases = ['left' if classification.classification[0].label == 'Right' else 'right'
+             for classification in results.multi_handedness]
+    positions = [(hand.landmark[0].x, hand.landmark[0].y) for hand in results.multi_hand_landmarks]
+    labels = [None] * len(bases)
+    
+    # Closest (hand, previous label) pairs first, same handedness first at equal distance
+    pairs = sorted(((position[0] - wrist[0]) ** 2 + (position[1] - wrist[1]) ** 2,
+                    label.rstrip('0123456789') != bases[index], index, label)
+                   for index, position in enumerate(positions)
+                   for label, wrist in previous.items())
+    for _, _, index, label in pairs:
+        if labels[index] is None and label not in labels:
+            labels[index] = label
+    for index, base in enumerate(bases):
+        number = 1
+        while labels[index] is None:
+            label = f"{base}{number}" if number > 1 else base
+            if label not in labels:
+                labels[index] = label
+            number += 1
+    
+    if wrists is not None:
+        wrists.clear()
+        wrists.update(zip(labels, positions))
+    return labels
+
+def compact_landmarks(hands):
+    """(21, 2) int16 (x, y) landmarks of the last hand, or None"""
+    if not hands:
+        return None
+    return hands[-1][1][:, 1:].astype(np.int16)
+
+def hand_results(hands, scale=1):
+    """
+    {handedness: (gesture, landmarks)} for every hand, landmarks as from
+    compact_landmarks and multiplied by scale
+    """
+    return {hand: (gesture, hand_coordinate[:, 1:].astype(np.int16) * np.int16(scale))
+            for _, hand_coordinate, gesture, hand in hands}
+
+def hands_to_dict(per_hand):
+    """JSON form of hand_results"""
+    return {hand: {'gesture': gesture, 'landmarks': landmarks.tolist()}
+            for hand, (gesture, landmarks) in per_hand.items()}
+
+class HandsPool:
+    """
+    Bounded pool of MediaPipe Hands graphs. Graphs are created on demand up
+    to size, after that acquire() waits for one to be released. Graphs that
+    track between frames are reset on release so the next user starts with a
+    full palm detection rather than the previous user's hand position.
+    """
+    def __init__(self, size, **options):
+        self.size = size
+        self.options = options
+        self.available = queue.Queue()
+        self.created = 0
+        self.lock = threading.Lock()
+    
+    def acquire(self, timeout=None):
+        try:
+            return self.available.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                return mp_hands.Hands(**self.options)
+        return self.available.get(timeout=timeout)
+    
+    def release(self, hands):
+        if not self.options.get('static_image_mode'):
+            # An empty frame drops the tracked hand
+            hands.process(self.blank_frame())
+        self.available.put(hands)
+    
+    @staticmethod
+    def blank_frame():
+        return np.zeros((64, 64, 3), dtype=np.uint8)
+    
+    def warm(self, count):
+        """Create up to count graphs now and run a first inference on each"""
+        graphs = []
+        with self.lock:
+            while self.created < min(count, self.size):
+                self.created += 1
+                graphs.append(mp_hands.Hands(**self.options))
+        for hands in graphs:
+            hands.process(self.blank_frame())
+            self.available.put(hands)
+        return len(graphs)
+    
+    def process(self, rgb_image, timeout=None):
+        """MediaPipe results for an RGB image, using any free graph"""
+        hands = self.acquire(timeout)
+        try:
+            return hands.process(rgb_image)
+        finally:
+            self.release(hands)
+    
+    def usage(self):
+        return {'size': self.size, 'created': self.created, 'idle': self.available.qsize()}
+
+# Uploaded frames come from many clients in any order, so these graphs run
+# in static image mode instead of tracking between frames
+upload_hands = HandsPool(
+    UPLOAD_POOL_SIZE,
+    static_image_mode=True,
+    max_num_hands=MAX_NUM_HANDS,
+    min_detection_confidence=0.5
+)
+
+camera_hands = HandsPool(
+    CAMERA_POOL_SIZE,
+    static_image_mode=False,
+    max_num_hands=MAX_NUM_HANDS,
+    min_detection_confidence=0.5,
+    min_tracking_confidence=0.5
+)
+
+def warm_up_hands():
+    """Build and run the pooled graphs before the first camera asks for one"""
+    start = time.perf_counter()
+    count = camera_hands.warm(HANDS_WARM) + upload_hands.warm(1)
+    print(f"Warmed up {count} MediaPipe graphs in {time.perf_counter() - start:.1f}s")
+
+def decode_frame(data, content_type, width=None, height=None):
+    """
+    RGB image from an uploaded frame: JPEG/WebP bytes, or raw RGB bytes
+    (application/octet-stream) together with their width and height
+    """
+    if not data:
+        raise ValueError("Empty frame")
+    if content_type == 'application/octet-stream':
+        if not width or not height or len(data) != width * height * 3:
+            raise ValueError("Raw frames need width and height matching width*height*3 bytes")
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+    image = cv.imdecode(np.frombuffer(data, dtype=np.uint8), cv.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode frame")
+    return cv.cvtColor(image, cv.COLOR_BGR2RGB)
+
+def recognize_frame(rgb_image, translator_session=None):
+    """
+    (gesture, compact landmarks, hand_results) for one uploaded RGB frame,
+    the first two being those of the last hand. Hands are labelled with the
+    wrists of the uploader's translator_session, under its letters_lock as
+    the client may upload several frames at once.
+    """
+    start = metrics.start('upload_inference')
+    results = upload_hands.process(rgb_image, timeout=2.0)
+    metrics.observe('upload_inference', start)
+    img_h, img_w = rgb_image.shape[:2]
+    start = metrics.start('classify')
+    if translator_session:
+        with translator_session.letters_lock:
+            gesture, hands = classify_results(results, img_w, img_h, translator_session.wrists)
+    else:
+        gesture, hands = classify_results(results, img_w, img_h)
+    metrics.observe('classify', start)
+    return gesture, compact_landmarks(hands), hand_results(hands)
+
+
+#==============================================================================
+# FRAME SOURCES
+#==============================================================================
+
+class FrameSource:
+    """
+    Base for frame sources, used like cv.VideoCapture (isOpened, read,
+    release). A reader thread decodes up to readahead frames ahead of the
+    consumer. Live sources keep only the newest frames, so a slow consumer
+    skips frames rather than falling behind; other sources never skip.
+    
+    Subclasses implement grab(), returning the next BGR frame already at
+    size (width, height) when one was asked for, or None at the end. With
+    fps, pace() in grab() spaces frames out to that rate.
+    """
+    def __init__(self, size=None, readahead=2, live=False, fps=None):
+        self.size = size
+        self.live = live
+        self.interval = 1.0 / fps if fps else 0
+        self.next_frame = None
+        self.frames = queue.Queue(maxsize=readahead)
+        self.skipped = 0
+        self.ended = False
+        self.running = False
+        self.thread = None
+    
+    def start(self):
+        if self.isOpened():
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name=f"source-{type(self).__name__}", daemon=True)
+            self.thread.start()
+        return self
+    
+    def _run(self):
+        while self.running:
+            try:
+                image = self.grab()
+            except Exception as e:
+                print(f"Error reading frames: {e}")
+                image = None
+            if image is None:
+                self.ended = True
+                self.frames.put(None)
+                return
+            if self.live:
+                while True:
+                    try:
+                        self.frames.put_nowait(image)
+                        break
+                    except queue.Full:
+                        try:
+                            self.frames.get_nowait()
+                            self.skipped += 1
+                        except queue.Empty:
+                            pass
+            else:
+                while self.running:
+                    try:
+                        self.frames.put(image, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+    
+    def isOpened(self):
+        return not self.ended
+    
+    def read(self, timeout=1.0):
+        """(success, image) like cv.VideoCapture.read"""
+        if self.ended and self.frames.empty():
+            return False, None
+        try:
+            image = self.frames.get(timeout=timeout)
+        except queue.Empty:
+            return False, None
+        return image is not None, image
+    
+    def release(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+        self.close()
+    
+    def close(self):
+        pass
+    
+    def pace(self):
+        if not self.interval:
+            return
+        now = time.perf_counter()
+        if self.next_frame is not None and self.next_frame > now:
+            time.sleep(self.next_frame - now)
+        self.next_frame = max(now, self.next_frame or now) + self.interval
+    
+    def fit(self, image):
+        """image resized to the requested size, if it isn't already"""
+        if self.size is None or (image.shape[1], image.shape[0]) == tuple(self.size):
+            return image
+        return cv.resize(image, tuple(self.size), interpolation=cv.INTER_AREA)
+
+class DeviceSource(FrameSource):
+    """A camera by device index. The driver is asked for size directly."""
+    def __init__(self, index=0, size=None, readahead=2):
+        super().__init__(size, readahead, live=True)
+        self.capture = cv.VideoCapture(index)
+        if size and self.capture.isOpened():
+            self.capture.set(cv.CAP_PROP_FRAME_WIDTH, size[0])
+            self.capture.set(cv.CAP_PROP_FRAME_HEIGHT, size[1])
+    
+    def isOpened(self):
+        return self.capture.isOpened() and not self.ended
+    
+    def grab(self):
+        success, image = self.capture.read()
+        return self.fit(image) if success else None
+    
+    def close(self):
+        self.capture.release()
+
+class VideoFileSource(FrameSource):
+    """
+    A video file, looping, at its own frame rate (realtime) or as fast as
+    it is read. Stream URLs (rtsp://, http://) work too; they are live and
+    never loop.
+    """
+    def __init__(self, path, size=None, loop=True, realtime=True, readahead=4):
+        stream = '://' in path
+        capture = cv.VideoCapture(path)
+        fps = capture.get(cv.CAP_PROP_FPS) if capture.isOpened() else 0
+        super().__init__(size, readahead, live=stream, fps=fps if realtime and not stream else None)
+        self.path = path
+        self.loop = loop and not stream
+        self.capture = capture
+    
+    def isOpened(self):
+        return self.capture.isOpened() and not self.ended
+    
+    def grab(self):
+        success, image = self.capture.read()
+        if not success and self.loop:
+            self.capture.set(cv.CAP_PROP_POS_FRAMES, 0)
+            success, image = self.capture.read()
+        if not success:
+            return None
+        self.pace()
+        return self.fit(image)
+    
+    def close(self):
+        self.capture.release()
+
+class ImageSequenceSource(FrameSource):
+    """
+    The images of a directory in name order, looping, at fps or as fast as
+    they decode. JPEGs are decoded at 1/2, 1/4 or 1/8 scale when that is
+    still at least the requested size.
+    """
+    def __init__(self, directory, size=None, loop=True, fps=None, readahead=4):
+        super().__init__(size, readahead, fps=fps)
+        self.paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                            if name.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.webp')))
+        self.loop = loop
+        self.position = 0
+        self.read_flag = cv.IMREAD_COLOR
+    
+    def isOpened(self):
+        return bool(self.paths) and not self.ended
+    
+    def grab(self):
+        if self.position >= len(self.paths):
+            if not self.loop:
+                return None
+            self.position = 0
+        self.pace()
+        image = cv.imread(self.paths[self.position], self.read_flag)
+        if self.position == 0 and self.size and self.read_flag == cv.IMREAD_COLOR:
+            self.read_flag = self.reduced_flag(image)
+        self.position += 1
+        return self.fit(image) if image is not None else None
+    
+    def reduced_flag(self, image):
+        """The cheapest imread flag that still decodes to at least self.size"""
+        for factor, flag in ((8, cv.IMREAD_REDUCED_COLOR_8), (4, cv.IMREAD_REDUCED_COLOR_4),
+                             (2, cv.IMREAD_REDUCED_COLOR_2)):
+            if image.shape[1] // factor >= self.size[0] and image.shape[0] // factor >= self.size[1]:
+                return flag
+        return cv.IMREAD_COLOR
+
+class SyntheticSource(FrameSource):
+    """
+    Frames drawn in memory: a ball bouncing over a gradient with a frame
+    counter, at fps or as fast as they are read. For load tests on machines
+    without a camera.
+    """
+    def __init__(self, size=None, fps=None, readahead=2):
+        super().__init__(size or (640, 480), readahead, fps=fps)
+        width, height = self.size
+        self.background = np.zeros((height, width, 3), dtype=np.uint8)
+        self.background[:, :, 0] = np.linspace(40, 200, width, dtype=np.uint8)
+        self.background[:, :, 1] = np.linspace(40, 120, height, dtype=np.uint8)[:, np.newaxis]
+        self.count = 0
+    
+    def grab(self):
+        self.pace()
+        width, height = self.size
+        image = self.background.copy()
+        radius = max(8, height // 10)
+        x = radius + int(abs((self.count * 7) % (2 * (width - 2 * radius)) - (width - 2 * radius)))
+        y = radius + int(abs((self.count * 5) % (2 * (height - 2 * radius)) - (height - 2 * radius)))
+        cv.circle(image, (x, y), radius, (60, 200, 240), -1)
+        cv.putText(image, str(self.count), (10, height - 10), cv.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        self.count += 1
+        return image
+
+def capture_size():
+    """(CAPTURE_WIDTH, CAPTURE_HEIGHT), or None to take frames as they come"""
+    if CAPTURE_WIDTH and CAPTURE_HEIGHT:
+        return CAPTURE_WIDTH, CAPTURE_HEIGHT
+    return None
+
+def open_source(spec, size=None, realtime=FRAME_SOURCE_REALTIME):
+    """
+    FrameSource for a spec: a device index ("0"), "synthetic", a directory of
+    images, or a video file or stream URL. The source is started.
+    """
+    spec = str(spec)
+    if spec.isdigit():
+        source = DeviceSource(int(spec), size)
+    elif spec == 'synthetic':
+        source = SyntheticSource(size, fps=30 if realtime else None)
+    elif os.path.isdir(spec):
+        source = ImageSequenceSource(spec, size, fps=30 if realtime else None)
+    else:
+        source = VideoFileSource(spec, size, realtime=realtime)
+    return source.start()
 
 #==============================================================================
 # VIDEO CAMERA CLASS
 #==============================================================================
 
+def unavailable_frame():
+    """JPEG of the "Camera not available" frame, rendered and encoded once"""
+    global _unavailable_frame
+    if _unavailable_frame is None:
+        dummy_frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        cv.putText(dummy_frame, "Camera not available", (50, 240), 
+                  cv.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        ret, buffer = cv.imencode('.jpg', dummy_frame)
+        _unavailable_frame = buffer.data
+    return _unavailable_frame
+
+_unavailable_frame = None
+
 class VideoCamera:
-    def __init__(self):
+    def __init__(self, hands_pool=None, source=None):
+        # Conversion and mirror targets, reused from frame to frame
+        self.rgb_buffer = None
+        self.mirror_buffer = None
+        self.jpeg_quality = JPEG_QUALITY
+        self.inference_width = INFERENCE_WIDTH
+        self.output_width = OUTPUT_WIDTH
+        self.scaled_buffers = {}
+        # Last wrist of every hand label, see handedness
+        self.wrists = {}
+        # Whether the last frame had a hand for MediaPipe to track, and how
+        # many frames it has been tracked without a full-frame search
+        self.tracking = False
+        self.tracked_frames = 0
+        self.roi_stats = {'tracked': 0, 'searched': 0, 'refreshed': 0}
+        self.hands_pool = hands_pool or camera_hands
+        self.hands = None
         try:
-            self.video = cv.VideoCapture(0)
+            self.video = source or open_source(FRAME_SOURCE, capture_size())
             if not self.video.isOpened():
                 print("Warning: Could not open camera. Check camera permissions.")
+                self.video.release()
                 self.video = None
             else:
                 print("Camera initialized successfully")
             
-            self.hands = mp_hands.Hands(
-                static_image_mode=False,
-                max_num_hands=1,
-                min_detection_confidence=0.5,
-                min_tracking_confidence=0.5
-            )
+            self.hands = self.hands_pool.acquire(timeout=10)
+        except queue.Empty:
+            print("Error initializing camera: no MediaPipe graph free in the pool")
         except Exception as e:
             print(f"Error initializing camera: {e}")
             self.video = None
-            self.hands = None
+    
+    def close(self):
+        """Release the frame source and hand the MediaPipe graph back to the pool"""
+        if self.video:
+            self.video.release()
+        if self.hands:
+            hands, self.hands = self.hands, None
+            self.hands_pool.release(hands)
     
     def __del__(self):
-        if self.video and self.video.isOpened():
+        if self.video:
             self.video.release()
     
+    @property
+    def available(self):
+        return self.video is not None and self.video.isOpened()
+    
+    def read(self):
+        """Capture stage: the next BGR frame from the device, or None"""
+        start = metrics.start('capture')
+        success, image = self.video.read()
+        metrics.observe('capture', start)
+        return image if success else None
+    
+    def detect(self, image):
+        """
+        Landmark inference stage: MediaPipe hand results for a BGR frame.
+        While a hand is tracked MediaPipe only looks at the region around it,
+        the results are relative to the whole frame either way. Frames wider
+        than inference_width are shrunk first, the normalized landmarks fit
+        the full-size frame all the same.
+        """
+        if not self.hands:
+            return None
+        if not self.tracking:
+            self.tracked_frames = 0
+            self.roi_stats['searched'] += 1
+        elif ROI_REFRESH and self.tracked_frames >= ROI_REFRESH:
+            # Dropping the tracked hand makes MediaPipe run palm detection on
+            # the whole of the next frame, which also catches a tracker that
+            # has drifted off the hand
+            self.hands.process(HandsPool.blank_frame())
+            self.tracked_frames = 0
+            self.roi_stats['refreshed'] += 1
+        else:
+            self.tracked_frames += 1
+            self.roi_stats['tracked'] += 1
+        start = metrics.start('convert')
+        image = self.downscale(image, self.inference_width, 'inference')
+        if self.rgb_buffer is None or self.rgb_buffer.shape != image.shape:
+            self.rgb_buffer = np.empty_like(image)
+        self.rgb_buffer.flags.writeable = True
+        cv.cvtColor(image, cv.COLOR_BGR2RGB, dst=self.rgb_buffer)
+        metrics.observe('convert', start)
+        self.rgb_buffer.flags.writeable = False
+        start = metrics.start('inference')
+        results = self.hands.process(self.rgb_buffer)
+        metrics.observe('inference', start)
+        self.tracking = bool(results and results.multi_hand_landmarks)
+        return results
+    
+    def downscale(self, image, width, purpose):
+        """
+        image shrunk to width (keeping its aspect ratio) in a buffer reused
+        for purpose, or image itself when it is no wider than that
+        """
+        img_h, img_w = image.shape[:2]
+        if not width or width >= img_w:
+            return image
+        shape = (img_h * width // img_w, width, 3)
+        buffer = self.scaled_buffers.get(purpose)
+        if buffer is None or buffer.shape != shape:
+            buffer = self.scaled_buffers[purpose] = np.empty(shape, dtype=np.uint8)
+        return cv.resize(image, (width, shape[0]), dst=buffer, interpolation=cv.INTER_AREA)
+    
+    def classify(self, image, results):
+        """Classification stage, see classify_results"""
+        img_h, img_w = image.shape[:2]
+        start = metrics.start('classify')
+        classified = classify_results(results, img_w, img_h, self.wrists)
+        metrics.observe('classify', start)
+        return classified
+    
+    def annotate(self, image, hands, gesture):
+        """
+        Annotate/encode stage: shrink to output_width, draw the hands, mirror
+        and JPEG encode
+        """
+        start = metrics.start('draw')
+        scale = 1
+        if self.output_width and self.output_width < image.shape[1]:
+            scale = self.output_width / image.shape[1]
+            image = self.downscale(image, self.output_width, 'output')
+        for hand_landmarks, hand_coordinate, hand_gesture, hand in hands:
+            # Draw landmarks on image
+            mp_drawing.draw_landmarks(
+                image, hand_landmarks, mp_hands.HAND_CONNECTIONS)
+            
+            # Draw bounding box
+            if len(hand_coordinate) > 0:
+                x_coords = hand_coordinate[:, 1]
+                y_coords = hand_coordinate[:, 2]
+                x_min, x_max = int(np.min(x_coords) * scale), int(np.max(x_coords) * scale)
+                y_min, y_max = int(np.min(y_coords) * scale), int(np.max(y_coords) * scale)
+                
+                # Draw rectangle and text
+                cv.rectangle(image, (x_min-10, y_min-10), (x_max+10, y_max+10), (0, 255, 0), 2)
+                cv.putText(image, f"{hand}: {hand_gesture}", (x_min-10, y_min-20), 
+                          cv.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        
+        # Add status text
+        cv.putText(image, f"Status: {'Active' if gesture else 'Ready'}", (10, 30), 
+                  cv.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        
+        # Flip image horizontally for mirror effect
+        if self.mirror_buffer is None or self.mirror_buffer.shape != image.shape:
+            self.mirror_buffer = np.empty_like(image)
+        image = cv.flip(image, 1, dst=self.mirror_buffer)
+        metrics.observe('draw', start)
+        
+        # Encode to JPEG and hand out a view on the encoder's buffer (no copy)
+        start = metrics.start('encode')
+        ret, buffer = cv.imencode('.jpg', image, (cv.IMWRITE_JPEG_QUALITY, self.jpeg_quality))
+        metrics.observe('encode', start)
+        return buffer.data
+    
     def get_frame(self):
+        """Run all stages synchronously on the next frame"""
         try:
-            if self.video is None or not self.video.isOpened():
-                # Return a dummy frame
-                dummy_frame = np.zeros((480, 640, 3), dtype=np.uint8)
-                cv.putText(dummy_frame, "Camera not available", (50, 240), 
-                          cv.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-                ret, buffer = cv.imencode('.jpg', dummy_frame)
-                frame = base64.b64encode(buffer).decode('utf-8') # type: ignore
-                return frame, "", None
+            if not self.available:
+                return unavailable_frame(), "", None
             
-            success, image = self.video.read()
-            if not success:
+            image = self.read()
+            if image is None:
                 return None, None, None
             
-            # Process the image for hand detection
-            image.flags.writeable = False
-            image = cv.cvtColor(image, cv.COLOR_BGR2RGB)
+            results = self.detect(image)
+            gesture, hands = self.classify(image, results)
+            frame = self.annotate(image, hands, gesture)
             
-            if self.hands:
-                results = self.hands.process(image)
-            else:
-                results = None
-            
-            # Draw the hand annotations on the image
-            image.flags.writeable = True
-            image = cv.cvtColor(image, cv.COLOR_RGB2BGR)
-            
-            gesture = ""
-            hand_landmarks_data = None
-            
-            if results and results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
-                    # Draw landmarks on image
-                    mp_drawing.draw_landmarks(
-                        image, hand_landmarks, mp_hands.HAND_CONNECTIONS)
-                    
-                    # Extract coordinates for recognition
-                    img_h, img_w = image.shape[:2]
-                    hand_coordinate = []
-                    
-                    for idx, landmark in enumerate(hand_landmarks.landmark):
-                        x_coord = int(landmark.x * img_w)
-                        y_coord = int(landmark.y * img_h)
-                        hand_coordinate.append([idx, x_coord, y_coord])
-                    
-                    hand_coordinate = np.array(hand_coordinate)
-                    gesture = persons_input(hand_coordinate)
-                    hand_landmarks_data = hand_coordinate.tolist()
-                    
-                    # Draw bounding box
-                    if len(hand_coordinate) > 0:
-                        x_coords = hand_coordinate[:, 1]
-                        y_coords = hand_coordinate[:, 2]
-                        x_min, x_max = np.min(x_coords), np.max(x_coords)
-                        y_min, y_max = np.min(y_coords), np.max(y_coords)
-                        
-                        # Draw rectangle and text
-                        cv.rectangle(image, (x_min-10, y_min-10), (x_max+10, y_max+10), (0, 255, 0), 2)
-                        cv.putText(image, gesture.strip(), (x_min-10, y_min-20), 
-                                  cv.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            
-            # Add status text
-            cv.putText(image, f"Status: {'Active' if gesture else 'Ready'}", (10, 30), 
-                      cv.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            
-            # Flip image horizontally for mirror effect
-            image = cv.flip(image, 1)
-            
-            # Encode image to base64 for web transmission
-            ret, buffer = cv.imencode('.jpg', image)
-            frame = base64.b64encode(buffer).decode('utf-8') # type: ignore
-            
-            return frame, gesture.strip(), hand_landmarks_data
+            return frame, gesture, compact_landmarks(hands)
             
         except Exception as e:
+            metrics.count('signlang_errors_total', stage='get_frame')
             print(f"Error in get_frame: {e}")
             return None, None, None
+    
+    def get_frame_base64(self):
+        """
+        Same as get_frame but with the JPEG base64 encoded and landmarks as
+        lists, for JSON consumers
+        """
+        frame, gesture, landmarks = self.get_frame()
+        if frame is not None:
+            frame = base64.b64encode(frame).decode('utf-8')
+        if landmarks is not None:
+            landmarks = landmarks.tolist()
+        return frame, gesture, landmarks
 
 #==============================================================================
-# FLASK ROUTES
+# FRAME PIPELINE
 #==============================================================================
 
-def generate_frames():
-    global camera, current_gesture, gesture_history
+class LatestFrameQueue:
+    """
+    Single-slot queue where put() overwrites whatever has not been taken yet,
+    so a slow consumer always gets the newest item and stale ones are dropped.
+    Drops are also counted in metrics under the queue's name.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.condition = threading.Condition()
+        self.item = None
+        self.has_item = False
+        self.dropped = 0
+    
+    def put(self, item):
+        with self.condition:
+            if self.has_item:
+                self.dropped += 1
+                metrics.count('signlang_frames_dropped_total', queue=self.name)
+            self.item = item
+            self.has_item = True
+            self.condition.notify_all()
+    
+    def get(self, timeout=None):
+        """Newest item, or None if nothing arrived within timeout"""
+        with self.condition:
+            if not self.has_item and not self.condition.wait(timeout):
+                return None
+            item = self.item
+            self.item = None
+            self.has_item = False
+            self.condition.notify_all()
+            return item
     
-    while is_camera_active:
-        if camera is None:
+    def wait_taken(self, timeout=None):
+        """Wait until the item waiting in the queue, if any, has been taken"""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.has_item, timeout)
+
+class FrameBroadcaster:
+    """
+    Single producer, many subscribers: every published item goes to each
+    subscriber's own LatestFrameQueue, so a slow client skips frames without
+    blocking the producer or the other clients
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.departed_dropped = 0
+    
+    def subscribe(self):
+        subscription = LatestFrameQueue('output')
+        with self.lock:
+            self.subscribers.append(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self.lock:
+            if subscription in self.subscribers:
+                self.subscribers.remove(subscription)
+                self.departed_dropped += subscription.dropped
+    
+    def publish(self, item):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.put(item)
+    
+    @property
+    def viewer_count(self):
+        return len(self.subscribers)
+    
+    @property
+    def dropped(self):
+        """Frames skipped by subscribers that could not keep up"""
+        with self.lock:
+            return self.departed_dropped + sum(s.dropped for s in self.subscribers)
+
+class FrameRateController:
+    """
+    Paces capture at target_fps and adapts to load. wait() sleeps off what
+    is left of each frame interval, so time spent reading the frame counts
+    towards it. Once per window, update() looks at how busy the busiest
+    processing stage was: above overload the next LEVELS step is taken,
+    below recover one step is undone. recover is low enough that undoing a
+    step (each roughly halves some stage's work) doesn't overload again.
+    """
+    LEVELS = ('full', 'low_jpeg_quality', 'alternate_inference', 'half_resolution')
+    
+    def __init__(self, target_fps, window=1.0, overload=0.9, recover=0.4):
+        self.target_fps = target_fps
+        self.interval = 1.0 / target_fps
+        self.window = window
+        self.overload = overload
+        self.recover = recover
+        self.level = 0
+        self.load = 0.0
+        self.effective_fps = 0.0
+        self.next_frame = None
+        self.window_start = time.perf_counter()
+        self.window_busy = {}
+        self.window_processed = 0
+    
+    def wait(self):
+        now = time.perf_counter()
+        if self.next_frame is None or now > self.next_frame:
+            # Running late: start a new schedule rather than bursting to catch up
+            self.next_frame = now
+        else:
+            time.sleep(self.next_frame - now)
+        self.next_frame += self.interval
+    
+    def update(self, busy, processed):
+        """
+        busy is the total seconds each processing stage has worked so far and
+        processed the number of frames that made it through the pipeline
+        """
+        now = time.perf_counter()
+        elapsed = now - self.window_start
+        if elapsed < self.window:
+            return
+        self.load = max((busy[stage] - self.window_busy.get(stage, 0.0) for stage in busy), default=0.0) / elapsed
+        self.effective_fps = (processed - self.window_processed) / elapsed
+        self.window_start = now
+        self.window_busy = dict(busy)
+        self.window_processed = processed
+        
+        if self.load > self.overload and self.level < len(self.LEVELS) - 1:
+            self.level += 1
+        elif self.load < self.recover and self.level > 0:
+            self.level -= 1
+    
+    def stats(self):
+        return {
+            'target_fps': self.target_fps,
+            'effective_fps': round(self.effective_fps, 1),
+            'load': round(self.load, 2),
+            'level': self.level,
+            'degradation': self.LEVELS[self.level]
+        }
+
+class FramePipeline:
+    """
+    Runs a VideoCamera as one thread per stage (capture -> landmark inference
+    -> classification -> annotate/encode) joined by LatestFrameQueues. The
+    frame rate is set by the slowest stage instead of the sum of all stages,
+    and a slow stage drops stale frames instead of stalling capture.
+    
+    Each frame is processed once: on_result(hand_results) is called for it
+    and the (frame, gesture, landmarks) result is published on output for
+    any number of viewers. Without viewers the pipeline runs landmark-only:
+    frames stop after classification, with no drawing, flipping or encoding.
+    
+    Capture is paced by a FrameRateController. As its level rises under load
+    the JPEG quality drops, then inference runs on every other frame only
+    (the frames in between reuse the previous frame's results, still passing
+    through the inference stage so frames keep their order), then frames are halved
+    in size before any processing. Landmarks passed to on_result stay in
+    full-resolution coordinates either way.
+    """
+    STAGES = ('capture', 'inference', 'classification', 'encode')
+    
+    def __init__(self, camera, on_result=None, target_fps=TARGET_FPS):
+        self.camera = camera
+        self.on_result = on_result
+        self.pacer = FrameRateController(target_fps)
+        self.last_results = None
+        self.reused = False
+        self.frames_captured = 0
+        self.skipped = 0
+        self.captured = LatestFrameQueue('captured')
+        self.detected = LatestFrameQueue('detected')
+        self.classified = LatestFrameQueue('classified')
+        self.output = FrameBroadcaster()
+        self.timings = {stage: None for stage in self.STAGES}
+        self.frames = {stage: 0 for stage in self.STAGES}
+        self.busy = {stage: 0.0 for stage in self.STAGES}
+        # Stage averages split by the number of hands in the frame
+        self.hand_timings = {}
+        self.running = False
+        self.threads = []
+    
+    def start(self):
+        self.running = True
+        steps = (self._capture, self._inference, self._classification, self._encode)
+        for stage, step in zip(self.STAGES, steps):
+            thread = threading.Thread(target=self._run, args=(stage, step),
+                                      name=f"pipeline-{stage}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+    
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join(timeout=1.0)
+        self.threads = []
+    
+    def _run(self, stage, step):
+        while self.running:
             try:
-                camera = VideoCamera()
+                step()
             except Exception as e:
-                print(f"Error creating camera: {e}")
-                break
+                metrics.count('signlang_errors_total', stage=stage)
+                print(f"Error in {stage} stage: {e}")
+                time.sleep(0.1)
+    
+    def _record(self, stage, start, hand_count=None):
+        elapsed = (time.perf_counter() - start) * 1000
+        self.busy[stage] += elapsed / 1000
+        self.timings[stage] = self._average(self.timings[stage], elapsed)
+        self.frames[stage] += 1
+        if hand_count is not None:
+            profile = self.hand_timings.setdefault(hand_count, {})
+            profile[stage] = self._average(profile.get(stage), elapsed)
+    
+    @staticmethod
+    def _average(average, elapsed):
+        # Exponential moving average, recent frames weigh the most
+        return elapsed if average is None else 0.9 * average + 0.1 * elapsed
+    
+    def _capture(self):
+        self.pacer.wait()
+        if not self.camera.available:
+            # Nothing to process, keep showing the "Camera not available" frame
+            if self.output.viewer_count:
+                self.output.publish(self.camera.get_frame())
+            return
+        start = time.perf_counter()
+        image = self.camera.read()
+        if image is None:
+            time.sleep(0.01)
+            return
+        level = self.pacer.level
+        self.camera.jpeg_quality = DEGRADED_JPEG_QUALITY if level >= 1 else JPEG_QUALITY
+        scale = 1
+        if level >= 3:
+            scale = 2
+            image = cv.resize(image, (image.shape[1] // 2, image.shape[0] // 2), interpolation=cv.INTER_AREA)
+        self._record('capture', start)
+        self.frames_captured += 1
+        # At level 2 the inference stage alternates between running MediaPipe
+        # and reusing the previous results. Skipped frames still pass through
+        # it, so frames stay in order.
+        self.captured.put((image, scale, level >= 2))
+        self.pacer.update({stage: self.busy[stage] for stage in self.STAGES[1:]},
+                          self.frames['classification'])
+    
+    def _inference(self):
+        item = self.captured.get(timeout=0.1)
+        if item is None:
+            return
+        image, scale, alternate = item
+        if alternate and not self.reused and self.last_results is not None:
+            # Landmarks are normalized, so they fit any frame size. Don't
+            # overwrite the frame that was just inferred before it is taken.
+            self.reused = True
+            self.skipped += 1
+            self.detected.wait_taken(timeout=0.1)
+            self.detected.put((image, scale, self.last_results))
+            return
+        self.reused = False
+        start = time.perf_counter()
+        results = self.camera.detect(image)
+        self._record('inference', start, len(results.multi_hand_landmarks or []) if results else 0)
+        self.last_results = results
+        self.detected.put((image, scale, results))
+    
+    def _classification(self):
+        item = self.detected.get(timeout=0.1)
+        if item is None:
+            return
+        image, scale, results = item
+        start = time.perf_counter()
+        gesture, hands = self.camera.classify(image, results)
+        self._record('classification', start, len(hands))
+        metrics.count('signlang_frames_total')
+        landmarks = compact_landmarks(hands)
+        if landmarks is not None and scale != 1:
+            landmarks *= scale
+        if self.on_result:
+            self.on_result(hand_results(hands, scale))
+        # Annotation is only worth doing for someone watching the video
+        if self.output.viewer_count:
+            self.classified.put((image, gesture, hands, landmarks))
+    
+    def _encode(self):
+        item = self.classified.get(timeout=0.1)
+        if item is None:
+            return
+        image, gesture, hands, landmarks = item
+        start = time.perf_counter()
+        frame = self.camera.annotate(image, hands, gesture)
+        self._record('encode', start)
+        self.output.publish((frame, gesture, landmarks))
+    
+    def stats(self):
+        """Per-stage average time and frame count, and frames dropped per queue"""
+        slowest = max((t for t in self.timings.values() if t), default=None)
+        return {
+            'stages': {
+                stage: {
+                    'avg_ms': round(self.timings[stage], 2) if self.timings[stage] is not None else None,
+                    'frames': self.frames[stage]
+                }
+                for stage in self.STAGES
+            },
+            'dropped': {
+                'captured': self.captured.dropped,
+                'detected': self.detected.dropped,
+                'classified': self.classified.dropped,
+                'output': self.output.dropped
+            },
+            'viewers': self.output.viewer_count,
+            'landmark_only': not self.output.viewer_count,
+            'max_fps': round(1000 / slowest, 1) if slowest else None,
+            'skipped_inference': self.skipped,
+            'roi': dict(self.camera.roi_stats),
+            'by_hand_count': {
+                hand_count: {stage: round(ms, 2) for stage, ms in profile.items()}
+                for hand_count, profile in sorted(self.hand_timings.items())
+            },
+            'pacing': self.pacer.stats()
+        }
+
+#==============================================================================
+# GESTURE HISTORY
+#==============================================================================
+
+class GestureEntry:
+    """
+    One history entry. Landmarks are kept as a (21, 2) int16 array of (x, y)
+    pixels, the landmark index being implied by the row. hand is the
+    handedness label of the hand that signed the letter.
+    
+    pack() gives the binary wire format: seq (int64), time (float64),
+    confidence (float32), gesture (4 ASCII bytes, NUL padded), a landmark
+    count (uint8, 0 or 21) and then that many (x, y) int16 pairs, all
+    little-endian. hand is not part of the binary format.
+    """
+    __slots__ = ('seq', 'gesture', 'timestamp', 'time', 'confidence', 'landmarks', 'hand')
+    HEADER = struct.Struct('<qdf4sB')
+    
+    def __init__(self, gesture, timestamp, unix_time, confidence, landmarks, seq=-1, hand=None):
+        self.seq = seq
+        self.gesture = gesture
+        self.timestamp = timestamp
+        self.time = unix_time
+        self.confidence = confidence
+        self.landmarks = landmarks
+        self.hand = hand
+    
+    def to_dict(self, landmarks=True):
+        entry = {
+            'seq': self.seq,
+            'gesture': self.gesture,
+            'timestamp': self.timestamp,
+            'time': self.time,
+            'confidence': self.confidence,
+            'hand': self.hand
+        }
+        if landmarks:
+            entry['landmarks'] = self.landmarks.tolist() if self.landmarks is not None else None
+        return entry
+    
+    @classmethod
+    def from_dict(cls, entry):
+        landmarks = entry.get('landmarks')
+        if landmarks is not None:
+            # Older logs stored [idx, x, y] rows, keep only (x, y)
+            landmarks = np.array(landmarks, dtype=np.int16)[:, -2:]
+        return cls(entry['gesture'], entry['timestamp'], entry['time'],
+                   entry.get('confidence', 1.0), landmarks, entry['seq'], entry.get('hand'))
+    
+    def pack(self):
+        count = 0 if self.landmarks is None else len(self.landmarks)
+        header = self.HEADER.pack(self.seq, self.time, self.confidence,
+                                  self.gesture.encode('ascii'), count)
+        if not count:
+            return header
+        return header + self.landmarks.astype('<i2').tobytes()
+
+def pack_entries(entries):
+    """Binary history: b'SLTH', a uint32 entry count, then the packed entries"""
+    return b''.join([b'SLTH', struct.pack('<I', len(entries))] + [entry.pack() for entry in entries])
+
+def unpack_entries(data):
+    """Inverse of pack_entries, for Python clients"""
+    if data[:4] != b'SLTH':
+        raise ValueError("Not a packed gesture history")
+    count, = struct.unpack_from('<I', data, 4)
+    offset = 8
+    entries = []
+    for _ in range(count):
+        seq, entry_time, confidence, gesture, landmark_count = GestureEntry.HEADER.unpack_from(data, offset)
+        offset += GestureEntry.HEADER.size
+        landmarks = None
+        if landmark_count:
+            landmarks = np.frombuffer(data, '<i2', landmark_count * 2, offset).reshape(landmark_count, 2)
+            offset += landmark_count * 4
+        entries.append(GestureEntry(gesture.rstrip(b'\0').decode('ascii'),
+                                    time.strftime("%H:%M:%S", time.localtime(entry_time)),
+                                    entry_time, round(confidence, 2), landmarks, seq))
+    return entries
+
+class GestureLog:
+    """
+    Append-only JSON-lines log of gesture entries in a directory. A new
+    segment file, named after its first sequence number, is started every
+    segment_entries entries and only the newest max_segments are kept. The
+    directory is only created with the first entry. Directories of open logs
+    are listed in GestureLog.open_directories, so pruning leaves them alone.
+    """
+    open_directories = set()
+    
+    def __init__(self, directory, segment_entries=10000, max_segments=10):
+        self.directory = directory
+        self.segment_entries = segment_entries
+        self.max_segments = max_segments
+        self.file = None
+        self.file_entries = 0
+    
+    def segments(self):
+        """(first_seq, path) of every segment, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith('.jsonl'))
+        return [(int(name[:-6]), os.path.join(self.directory, name)) for name in names]
+    
+    def append(self, entry):
+        if self.file is None or self.file_entries >= self.segment_entries:
+            self._rotate(entry['seq'])
+        self.file.write(json.dumps(entry) + '\n')
+        self.file.flush()
+        self.file_entries += 1
+    
+    def _rotate(self, first_seq):
+        if self.file:
+            self.file.close()
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            GestureLog.open_directories.add(os.path.abspath(self.directory))
+        self.file = open(os.path.join(self.directory, f"{first_seq:012d}.jsonl"), 'a')
+        self.file_entries = 0
+        for _, path in self.segments()[:-self.max_segments]:
+            os.remove(path)
+    
+    def read(self, cursor=-1, since=None, limit=None):
+        """Entries with seq > cursor and time > since, oldest first"""
+        segments = self.segments()
+        entries = []
+        for index, (first_seq, path) in enumerate(segments):
+            # Skip whole segments that end before the cursor
+            if index + 1 < len(segments) and segments[index + 1][0] <= cursor + 1:
+                continue
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    if entry['seq'] > cursor and (since is None or entry['time'] > since):
+                        entries.append(entry)
+                        if limit and len(entries) >= limit:
+                            return entries
+        return entries
+    
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+            GestureLog.open_directories.discard(os.path.abspath(self.directory))
+
+def prune_gesture_logs(directory, max_logs=HISTORY_MAX_LOGS, max_age_days=HISTORY_MAX_AGE):
+    """
+    Remove session log directories under directory beyond the max_logs most
+    recently written ones, and those not written for max_age_days. Logs that
+    are open count towards max_logs but are never removed.
+    """
+    if not os.path.isdir(directory):
+        return []
+    logs = []
+    for name in os.listdir(directory):
+        path = os.path.abspath(os.path.join(directory, name))
+        if os.path.isdir(path):
+            files = [os.path.join(path, file) for file in os.listdir(path)]
+            written = max((os.path.getmtime(file) for file in files), default=os.path.getmtime(path))
+            logs.append((written, path))
+    logs.sort(reverse=True)
+    cutoff = time.time() - max_age_days * 86400
+    removed = []
+    for index, (written, path) in enumerate(logs):
+        if path in GestureLog.open_directories:
+            continue
+        if (max_logs and index >= max_logs) or (max_age_days and written < cutoff):
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+    return removed
+
+class GestureHistory:
+    """
+    Fixed-size ring buffer of the latest gesture entries. Entries are
+    numbered with an ever-increasing seq so clients can fetch only what came
+    after a cursor, and with a GestureLog they are also written to disk,
+    which lets the history survive restarts and be queried past the buffer.
+    """
+    def __init__(self, capacity, log=None):
+        self.capacity = capacity
+        self.entries = [None] * capacity
+        self.next_seq = 0
+        self.start_seq = 0
+        self.log = log
+        self.lock = threading.Lock()
+        if log:
+            self._restore()
+    
+    def _restore(self):
+        segments = self.log.segments()
+        if not segments:
+            return
+        # Only the newest segments can hold the last `capacity` entries
+        for entry in self.log.read(cursor=segments[-1][0] - self.capacity - 1):
+            if entry.get('cleared'):
+                self.start_seq = entry['seq'] + 1
+            else:
+                self.entries[entry['seq'] % self.capacity] = GestureEntry.from_dict(entry)
+            self.next_seq = entry['seq'] + 1
+    
+    def append(self, entry):
+        """Number a GestureEntry, store it and log it"""
+        with self.lock:
+            entry.seq = self.next_seq
+            self.entries[self.next_seq % self.capacity] = entry
+            self.next_seq += 1
+            if self.log:
+                self.log.append(entry.to_dict())
+        return entry
+    
+    def clear(self):
+        with self.lock:
+            if self.log:
+                self.log.append({'seq': self.next_seq, 'time': time.time(), 'cleared': True})
+            self.next_seq += 1
+            self.start_seq = self.next_seq
+    
+    def __len__(self):
+        return self.next_seq - self._first_seq()
+    
+    def _first_seq(self):
+        return max(self.start_seq, self.next_seq - self.capacity)
+    
+    def since(self, cursor=None, since=None, limit=None):
+        """
+        Entries with seq > cursor and time > since, oldest first. Without a
+        cursor only the ring buffer is returned, cursors that fall before it
+        are answered from the on-disk log.
+        """
+        with self.lock:
+            start = self.start_seq if cursor is None else max(cursor + 1, self.start_seq)
+            if start < self._first_seq() and self.log and cursor is not None:
+                return [GestureEntry.from_dict(entry) for entry in self.log.read(start - 1, since, limit)]
+            entries = [self.entries[seq % self.capacity]
+                       for seq in range(max(start, self._first_seq()), self.next_seq)]
+        if since is not None:
+            entries = [entry for entry in entries if entry.time > since]
+        return entries[:limit] if limit else entries
+    
+    def latest(self, count):
+        return self.since(self.next_seq - count - 1)
+
+#==============================================================================
+# SESSIONS
+#==============================================================================
+
+class SessionLimitError(Exception):
+    pass
+
+class HandTrack:
+    """Stabilizer, current letter and letter history of one hand"""
+    def __init__(self, hand):
+        self.hand = hand
+        self.stabilizer = GestureStabilizer(STABILIZER_WINDOW, STABILIZER_MIN_HOLD)
+        self.history = GestureHistory(max_history)
+        self.current_gesture = ""
+    
+    def usage(self):
+        return {'current_gesture': self.current_gesture, 'history_count': len(self.history)}
+
+class TranslatorSession:
+    """
+    Everything one client owns: its camera, MediaPipe hands and pipeline, and
+    its current gesture and history. Socket.IO events for the session go to
+    rooms prefixed with its ID.
+    
+    Every hand seen gets a HandTrack, gesture_history holds the letters of
+    all hands. Words are spelled by one hand at a time: the first to commit
+    a letter after the last word ended.
+    
+    Letters arrive from the pipeline thread and from upload requests, so
+    tracks, words, histories and the wrists of uploaded hands are changed
+    and read under letters_lock.
+    lock only guards starting and stopping the camera.
+    """
+    def __init__(self, session_id):
+        self.id = session_id
+        self.camera = None
+        self.pipeline = None
+        self.lock = threading.Lock()
+        self.letters_lock = threading.Lock()
+        self.is_camera_active = False
+        self.current_gesture = ""
+        log = None
+        if HISTORY_DIR:
+            log = GestureLog(os.path.join(HISTORY_DIR, ''.join(c for c in session_id if c.isalnum())))
+        self.gesture_history = GestureHistory(max_history, log)
+        self.tracks = {}
+        # Wrists of the last uploaded frame, see handedness and recognize_frame
+        self.wrists = {}
+        self.last_track = None
+        self.word_hand = None
+        self.word_assembler = WordAssembler(lexicon)
+        self.words = deque(maxlen=max_history)
+        self.last_letter_at = None
+        self.created = time.time()
+        self.last_seen = self.created
+    
+    def touch(self):
+        self.last_seen = time.time()
+    
+    @property
+    def viewer_count(self):
+        return self.pipeline.output.viewer_count if self.pipeline else 0
+    
+    @property
+    def socket_count(self):
+        """Socket.IO clients in the session's room, letter-only ones included"""
+        return sum(1 for _ in socketio.server.manager.get_participants('/', self.id))
+    
+    def idle_for(self):
+        """Seconds since the client was last seen, 0 while video is streaming or sockets are connected"""
+        if self.viewer_count or self.socket_count:
+            return 0
+        return time.time() - self.last_seen
+    
+    def start(self):
+        """Create the camera and its frame pipeline if they are not running yet"""
+        with self.lock:
+            self.is_camera_active = True
+            if self.camera is None:
+                self.camera = VideoCamera()
+            if self.pipeline is None:
+                self.pipeline = FramePipeline(self.camera, on_result=self.record_hands)
+                self.pipeline.start()
+            return self.pipeline
+    
+    def stop(self):
+        with self.lock:
+            self.is_camera_active = False
+            if self.pipeline:
+                self.pipeline.stop()
+                self.pipeline = None
+            if self.camera:
+                self.camera.close()
+                self.camera = None
+    
+    def close(self):
+        self.stop()
+        if self.gesture_history.log:
+            self.gesture_history.log.close()
+    
+    def record_hands(self, hands):
+        """
+        Feed one processed frame's hand_results. Hands missing from the frame
+        count as showing nothing. Current gestures and histories only change
+        when a hand's stabilizer commits a letter.
+        """
+        with self.letters_lock:
+            for hand in hands:
+                if hand not in self.tracks:
+                    self.tracks[hand] = HandTrack(hand)
+            for hand, track in list(self.tracks.items()):
+                gesture, landmarks = hands.get(hand, ("", None))
+                gesture = track.stabilizer.update(gesture)
+                if gesture == "":
+                    # The hand left the frame long enough to count as a pause
+                    if hand == self.word_hand:
+                        self.end_word()
+                elif gesture:
+                    self.record_letter(track, gesture, landmarks)
+    
+    def record_letter(self, track, gesture, landmarks):
+        now = time.time()
+        if self.word_hand in (None, track.hand):
+            if self.last_letter_at and now - self.last_letter_at > WORD_GAP:
+                self.end_word()
+            self.word_hand = track.hand
+            self.last_letter_at = now
+            self.word_assembler.add_letter(gesture)
         
-        frame, gesture, landmarks = camera.get_frame()
+        self.current_gesture = track.current_gesture = gesture
+        self.last_track = track
+        timestamp = time.strftime("%H:%M:%S")
+        confidence = round(track.stabilizer.confidence(), 2)
+        track.history.append(GestureEntry(gesture, timestamp, now, confidence, landmarks, hand=track.hand))
+        gesture_entry = self.gesture_history.append(
+            GestureEntry(gesture, timestamp, now, confidence, landmarks, hand=track.hand))
         
-        if frame:
-            # Update current gesture and history
-            if gesture and gesture != current_gesture:
-                current_gesture = gesture
-                timestamp = time.strftime("%H:%M:%S")
-                gesture_entry = {
-                    'gesture': gesture,
-                    'timestamp': timestamp,
-                    'landmarks': landmarks
-                }
-                gesture_history.append(gesture_entry)
-                
-                # Limit history size
-                if len(gesture_history) > max_history:
-                    gesture_history.pop(0)
-                
-                print(f"New gesture detected: {gesture} at {timestamp}")
-            
-            yield f"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
-            yield base64.b64decode(frame)
-            yield f"\r\n"
+        # Push only the change, landmarks go to clients that asked for them
+        socketio.emit('new_gesture', gesture_entry.to_dict(landmarks=False), to=f"{self.id}:letters")
+        socketio.emit('new_gesture', gesture_entry.to_dict(), to=f"{self.id}:landmarks")
+        socketio.emit('packed_gesture', gesture_entry.pack(), to=f"{self.id}:packed")
         
-        time.sleep(0.1)  # Control frame rate
+        print(f"New gesture detected: {gesture} ({track.hand}) at {timestamp}")
+    
+    def end_word(self):
+        self.word_hand = None
+        word = self.word_assembler.end_word()
+        if word:
+            self.words.append(word)
+            socketio.emit('new_word', {'word': word, 'timestamp': time.strftime("%H:%M:%S")},
+                          to=self.id)
+            print(f"New word: {word}")
+    
+    def clear_history(self):
+        with self.letters_lock:
+            self.gesture_history.clear()
+            for track in self.tracks.values():
+                track.history.clear()
+            self.words.clear()
+            self.word_assembler.end_word()
+        socketio.emit('history_cleared', to=self.id)
+    
+    def current_confidences(self):
+        """Letter confidences of the hand that committed the last letter"""
+        with self.letters_lock:
+            return self.last_track.stabilizer.confidences() if self.last_track else {}
+    
+    def hand_gestures(self):
+        """{hand: {'gesture', 'confidence'}} for every hand seen"""
+        with self.letters_lock:
+            return {
+                hand: {'gesture': track.current_gesture, 'confidence': track.stabilizer.confidences()}
+                for hand, track in self.tracks.items()
+            }
+    
+    def transcript(self):
+        with self.letters_lock:
+            return {
+                'words': list(self.words),
+                'partial': self.word_assembler.partial,
+                'candidates': self.word_assembler.candidates()
+            }
+    
+    def usage(self):
+        with self.letters_lock:
+            hands = {hand: track.usage() for hand, track in self.tracks.items()}
+        return {
+            'camera_active': self.is_camera_active,
+            'viewers': self.viewer_count,
+            'sockets': self.socket_count,
+            'history_count': len(self.gesture_history),
+            'hands': hands,
+            'age_s': round(time.time() - self.created, 1),
+            'idle_s': round(self.idle_for(), 1),
+            'pipeline': self.pipeline.stats() if self.pipeline else None
+        }
+
+class SessionManager:
+    """
+    Registry of TranslatorSessions keyed by session ID. At most max_sessions
+    exist at once, and a reaper thread drops sessions that have been idle for
+    longer than idle_timeout seconds, releasing their camera and MediaPipe.
+    """
+    def __init__(self, max_sessions, idle_timeout):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.reaper = None
+    
+    def get(self, session_id, create=True):
+        with self.lock:
+            translator_session = self.sessions.get(session_id)
+            if translator_session is None and create:
+                if len(self.sessions) >= self.max_sessions:
+                    raise SessionLimitError(f"Too many active sessions (max {self.max_sessions})")
+                translator_session = TranslatorSession(session_id)
+                self.sessions[session_id] = translator_session
+                self._start_reaper()
+        if translator_session:
+            translator_session.touch()
+        return translator_session
+    
+    def remove(self, session_id):
+        with self.lock:
+            translator_session = self.sessions.pop(session_id, None)
+        if translator_session:
+            translator_session.close()
+    
+    def reap(self):
+        """Remove every session idle for longer than idle_timeout, and old session logs"""
+        with self.lock:
+            idle = [s.id for s in self.sessions.values() if s.idle_for() > self.idle_timeout]
+        for session_id in idle:
+            print(f"Closing idle session {session_id[:8]}")
+            self.remove(session_id)
+        if HISTORY_DIR:
+            for path in prune_gesture_logs(HISTORY_DIR):
+                print(f"Removed old gesture log {path}")
+    
+    def _start_reaper(self):
+        if self.reaper is not None:
+            return
+        
+        def run():
+            while True:
+                time.sleep(min(self.idle_timeout, 30))
+                try:
+                    self.reap()
+                except Exception as e:
+                    print(f"Error reaping sessions: {e}")
+        
+        self.reaper = threading.Thread(target=run, name="session-reaper", daemon=True)
+        self.reaper.start()
+    
+    def usage(self):
+        with self.lock:
+            translator_sessions = list(self.sessions.values())
+        return {s.id[:8]: s.usage() for s in translator_sessions}
+
+session_manager = SessionManager(MAX_SESSIONS, SESSION_IDLE_TIMEOUT)
+# Sessions of clients that upload their own frames: no camera or pipeline,
+# just the letter tracks and history
+upload_sessions = SessionManager(MAX_UPLOAD_SESSIONS, SESSION_IDLE_TIMEOUT)
+
+def client_id():
+    """ID of the requesting client, kept in the signed session cookie"""
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+def session_id():
+    """
+    ID of the TranslatorSession the requesting client uses: the shared
+    camera session, the session it attached to with /?session=<id>, or its own
+    """
+    if SHARED_CAMERA:
+        return 'shared'
+    return session.get('attach') or client_id()
+
+def get_session(create=True):
+    """The camera TranslatorSession of the requesting client"""
+    return session_manager.get(session_id(), create)
+
+def upload_session_id():
+    return f"upload-{client_id()}"
+
+def get_upload_session(create=True):
+    """The requesting client's own session for the frames it uploads"""
+    return upload_sessions.get(upload_session_id(), create)
+
+def current_session_id():
+    """ID of the session whose letters the client reads: its upload session once it has one, else the camera session"""
+    upload_id = upload_session_id()
+    return upload_id if upload_id in upload_sessions.sessions else session_id()
+
+def current_session():
+    return get_upload_session(create=False) or get_session(create=False)
+
+#==============================================================================
+# FLASK ROUTES
+#==============================================================================
+
+def generate_frames(translator_session):
+    try:
+        frames = translator_session.start()
+    except Exception as e:
+        metrics.count('signlang_errors_total', stage='camera')
+        print(f"Error creating camera: {e}")
+        return
+    
+    # Every viewer subscribes to the session's one pipeline instead of
+    # processing frames itself, a viewer that falls behind just skips to the
+    # newest frame
+    subscription = frames.output.subscribe()
+    try:
+        while translator_session.is_camera_active:
+            item = subscription.get(timeout=1.0)
+            if item is None:
+                continue
+            frame, gesture, landmarks = item
+            
+            if frame is not None:
+                # WSGI servers only accept bytes, so the multipart part is built in
+                # a single join straight from the JPEG buffer
+                chunk = b"".join((b"--frame\r\nContent-Type: image/jpeg\r\n\r\n", frame, b"\r\n"))
+                # The generator is suspended while the server writes the chunk
+                start = metrics.start('write')
+                yield chunk
+                metrics.observe('write', start)
+    finally:
+        frames.output.unsubscribe(subscription)
+        translator_session.touch()
 
 @app.route('/')
 def index():
+    # Set the cookie before the page opens its socket, so HTTP requests and
+    # Socket.IO events resolve to the same session
+    client_id()
+    attach = request.args.get('session')
+    if attach is not None:
+        # ?session= (empty) goes back to the client's own session
+        if attach and attach != session['sid'] and session_manager.get(attach, create=False):
+            session['attach'] = attach
+        else:
+            session.pop('attach', None)
     return render_template_string(HTML_TEMPLATE)
 
 @app.route('/start_camera')
 def start_camera():
-    global is_camera_active, camera
     try:
-        if not is_camera_active:
-            is_camera_active = True
-            if camera is None:
-                camera = VideoCamera()
+        translator_session = get_session()
+        if not translator_session.is_camera_active:
+            translator_session.start()
             print("Camera started successfully")
         return jsonify({'status': 'started', 'message': 'Camera activated'})
     except Exception as e:
+        metrics.count('signlang_errors_total', stage='camera')
         print(f"Error starting camera: {e}")
         return jsonify({'status': 'error', 'message': str(e)})
 
 @app.route('/stop_camera')
 def stop_camera():
-    global is_camera_active, camera
     try:
-        is_camera_active = False
-        if camera:
-            del camera
-            camera = None
+        translator_session = get_session(create=False)
+        if translator_session:
+            translator_session.stop()
         print("Camera stopped successfully")
         return jsonify({'status': 'stopped', 'message': 'Camera deactivated'})
     except Exception as e:
@@ -329,35 +2382,212 @@ def stop_camera():
 
 @app.route('/video_feed')
 def video_feed():
-    return Response(generate_frames(), # type: ignore
+    try:
+        translator_session = get_session()
+    except SessionLimitError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
+    return Response(generate_frames(translator_session), # type: ignore
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/get_current_gesture')
 def get_current_gesture():
+    translator_session = current_session()
     return jsonify({
-        'gesture': current_gesture,
+        'gesture': translator_session.current_gesture if translator_session else "",
+        'confidence': translator_session.current_confidences() if translator_session else {},
+        'hands': translator_session.hand_gestures() if translator_session else {},
         'timestamp': time.strftime("%H:%M:%S")
     })
 
 @app.route('/get_gesture_history')
 def get_gesture_history():
-    return jsonify({'history': gesture_history})
+    """
+    Gesture history, oldest first. ?cursor=<seq> returns only entries after
+    that seq, ?since=<unix time> only newer ones, ?limit=<n> at most n.
+    ?hand=<handedness> reads that hand's own track, whose seqs are its own.
+    ?format=binary answers with pack_entries instead of JSON.
+    """
+    translator_session = current_session()
+    if not translator_session:
+        return jsonify({'history': [], 'cursor': -1})
+    cursor = request.args.get('cursor', type=int)
+    gesture_history = translator_session.gesture_history
+    hand = request.args.get('hand')
+    if hand:
+        if hand not in translator_session.tracks:
+            return jsonify({'history': [], 'cursor': -1})
+        gesture_history = translator_session.tracks[hand].history
+    history = gesture_history.since(
+        cursor, request.args.get('since', type=float), request.args.get('limit', type=int))
+    if request.args.get('format') == 'binary':
+        return Response(pack_entries(history), mimetype='application/octet-stream')
+    if history:
+        cursor = history[-1].seq
+    return jsonify({'history': [entry.to_dict() for entry in history],
+                    'cursor': cursor if cursor is not None else -1})
+
+@app.route('/get_transcript')
+def get_transcript():
+    translator_session = current_session()
+    if not translator_session:
+        return jsonify({'words': [], 'partial': "", 'candidates': []})
+    return jsonify(translator_session.transcript())
 
 @app.route('/clear_history')
 def clear_history():
-    global gesture_history
-    gesture_history = []
+    translator_session = current_session()
+    if translator_session:
+        translator_session.clear_history()
     return jsonify({'status': 'cleared'})
 
+@app.route('/process_frame', methods=['POST'])
+def process_frame():
+    """
+    Recognize a frame captured by the client's own camera. The body (or a
+    'frame' form file) is a JPEG/WebP image, or raw RGB bytes sent as
+    application/octet-stream with ?width=&height=
+    """
+    try:
+        translator_session = get_upload_session()
+        if 'frame' in request.files:
+            upload = request.files['frame']
+            data, content_type = upload.read(), upload.mimetype
+        else:
+            data, content_type = request.get_data(), request.mimetype
+        rgb_image = decode_frame(data, content_type,
+                                 request.args.get('width', type=int),
+                                 request.args.get('height', type=int))
+        gesture, landmarks, hands = recognize_frame(rgb_image, translator_session)
+        translator_session.record_hands(hands)
+        return jsonify({'gesture': gesture, 'landmarks': landmarks.tolist() if landmarks is not None else None,
+                        'hands': hands_to_dict(hands)})
+    except ValueError as e:
+        metrics.count('signlang_errors_total', stage='upload')
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except (SessionLimitError, queue.Empty) as e:
+        metrics.count('signlang_errors_total', stage='busy')
+        return jsonify({'status': 'error', 'message': str(e) or 'Server busy'}), 503
+
 @app.route('/health')
 def health_check():
+    translator_session = get_session(create=False)
     return jsonify({
         'status': 'healthy',
-        'camera_active': is_camera_active,
-        'current_gesture': current_gesture,
-        'history_count': len(gesture_history)
+        'session': session_id(),
+        'camera_active': translator_session.is_camera_active if translator_session else False,
+        'current_gesture': translator_session.current_gesture if translator_session else "",
+        'history_count': len(translator_session.gesture_history) if translator_session else 0,
+        'max_sessions': session_manager.max_sessions,
+        'sessions': session_manager.usage(),
+        'max_upload_sessions': upload_sessions.max_sessions,
+        'upload_sessions': len(upload_sessions.sessions),
+        'upload_hands': upload_hands.usage(),
+        'camera_hands': camera_hands.usage(),
+        'classifier': 'learned' if learned_classifier is not None else 'rules'
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text format: stage latencies, drops, errors and live gauges"""
+    with session_manager.lock:
+        translator_sessions = list(session_manager.sessions.values())
+    pipelines = {s.id[:8]: s.pipeline for s in translator_sessions if s.pipeline}
+    gauges = [
+        ('signlang_sessions', "Translator sessions alive",
+         {(('kind', 'camera'),): len(translator_sessions),
+          (('kind', 'upload'),): len(upload_sessions.sessions)}),
+        ('signlang_cameras_active', "Sessions with the camera running",
+         {(): sum(s.is_camera_active for s in translator_sessions)}),
+        ('signlang_viewers', "Clients watching /video_feed",
+         {(): sum(s.viewer_count for s in translator_sessions)}),
+        ('signlang_hands_idle', "Idle MediaPipe graphs per pool",
+         {(('pool', 'camera'),): camera_hands.available.qsize(),
+          (('pool', 'upload'),): upload_hands.available.qsize()}),
+        ('signlang_effective_fps', "Frames per second through each session's pipeline",
+         {(('session', sid),): round(p.pacer.effective_fps, 2) for sid, p in pipelines.items()}),
+        ('signlang_degradation_level', "Load degradation step of each session's pipeline",
+         {(('session', sid),): p.pacer.level for sid, p in pipelines.items()})
+    ]
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+#==============================================================================
+# SOCKET.IO EVENTS
+#==============================================================================
+
+@socketio.on('connect')
+def handle_connect():
+    # Rooms are only names, so a client can join its session's rooms before
+    # the session exists; it is created once the camera starts
+    sid = current_session_id()
+    translator_session = current_session()
+    
+    # Every client gets letter-only updates until it subscribes to landmarks
+    join_room(sid)
+    join_room(f"{sid}:letters")
+    emit('connection_response', {
+        'session': sid,
+        'gesture': translator_session.current_gesture if translator_session else "",
+        'timestamp': time.strftime("%H:%M:%S"),
+        'history': [
+            entry.to_dict(landmarks=False)
+            for entry in translator_session.gesture_history.latest(10)
+        ] if translator_session else []
+    })
+
+@socketio.on('disconnect')
+def handle_disconnect(reason=None):
+    # Connected sockets keep a session alive, its idle time starts when the
+    # last one leaves
+    translator_session = current_session()
+    if translator_session:
+        translator_session.touch()
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    """
+    {'landmarks': true} adds the 21 (x, y) landmarks to every new_gesture
+    event, {'landmarks': true, 'binary': true} sends packed_gesture events
+    (GestureEntry.pack bytes) instead
+    """
+    sid = current_session_id()
+    for room in ('letters', 'landmarks', 'packed'):
+        leave_room(f"{sid}:{room}")
+    if data and data.get('landmarks'):
+        room = 'packed' if data.get('binary') else 'landmarks'
+    else:
+        room = 'letters'
+    join_room(f"{sid}:{room}")
+
+@socketio.on('process_frame')
+def handle_process_frame(data):
+    """
+    Socket.IO variant of /process_frame, data is {'image': bytes} or
+    {'rgb': bytes, 'width': w, 'height': h}. The result is the ack value.
+    """
+    try:
+        upload_id = upload_session_id()
+        first_upload = upload_id not in upload_sessions.sessions
+        translator_session = get_upload_session()
+        if first_upload:
+            # From now on the socket follows the client's own letters
+            sid = session_id()
+            for room in ('', ':letters', ':landmarks', ':packed'):
+                leave_room(sid + room)
+            join_room(upload_id)
+            join_room(f"{upload_id}:letters")
+        if 'rgb' in data:
+            rgb_image = decode_frame(data['rgb'], 'application/octet-stream',
+                                     data.get('width'), data.get('height'))
+        else:
+            rgb_image = decode_frame(data.get('image'), 'image/jpeg')
+        gesture, landmarks, hands = recognize_frame(rgb_image, translator_session)
+        translator_session.record_hands(hands)
+        return {'gesture': gesture, 'landmarks': landmarks.tolist() if landmarks is not None else None,
+                'hands': hands_to_dict(hands)}
+    except (ValueError, SessionLimitError, queue.Empty) as e:
+        metrics.count('signlang_errors_total', stage='upload' if isinstance(e, ValueError) else 'busy')
+        return {'status': 'error', 'message': str(e) or 'Server busy'}
+
 #==============================================================================
 # HTML TEMPLATE (EMBEDDED)
 #==============================================================================
@@ -370,6 +2600,7 @@ HTML_TEMPLATE = '''
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Sign Language Translator</title>
     <link href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css" rel="stylesheet">
+    <script src="https://cdn.socket.io/4.7.2/socket.io.min.js"></script>
     <style>
         * {
             margin: 0;
@@ -763,6 +2994,8 @@ HTML_TEMPLATE = '''
     <script>
         let updateInterval = null;
         let isActive = false;
+        let socket = null;
+        let recentHistory = [];
 
         const videoFeed = document.getElementById('video-feed');
         const cameraPlaceholder = document.getElementById('camera-placeholder');
@@ -779,6 +3012,38 @@ HTML_TEMPLATE = '''
         stopBtn.addEventListener('click', stopCamera);
         clearHistoryBtn.addEventListener('click', clearHistory);
 
+        function showGesture(gesture, timestamp) {
+            const newGesture = gesture || '-';
+            if (newGesture !== currentLetter.textContent) {
+                currentLetter.textContent = newGesture;
+                currentLetter.classList.add('active');
+                setTimeout(() => currentLetter.classList.remove('active'), 1000);
+            }
+            currentTimestamp.textContent = timestamp;
+        }
+
+        function connectSocket() {
+            // Without the Socket.IO client (e.g. CDN blocked) fall back to polling
+            if (typeof io === 'undefined') return;
+
+            socket = io();
+            socket.on('connection_response', data => {
+                recentHistory = data.history;
+                updateHistory(recentHistory);
+            });
+            socket.on('new_gesture', data => {
+                if (!isActive) return;
+                showGesture(data.gesture, data.timestamp);
+                recentHistory.push(data);
+                recentHistory = recentHistory.slice(-10);
+                updateHistory(recentHistory);
+            });
+            socket.on('history_cleared', () => {
+                recentHistory = [];
+                updateHistory(recentHistory);
+            });
+        }
+
         function updateStatus(online) {
             if (online) {
                 statusDot.classList.add('online');
@@ -854,6 +3119,9 @@ HTML_TEMPLATE = '''
         }
 
         function startUpdating() {
+            // Updates are pushed over the socket, polling is only the fallback
+            if (socket) return;
+
             updateInterval = setInterval(async () => {
                 if (!isActive) return;
                 
@@ -862,13 +3130,7 @@ HTML_TEMPLATE = '''
                     const gestureResponse = await fetch('/get_current_gesture');
                     const gestureData = await gestureResponse.json();
                     
-                    const newGesture = gestureData.gesture || '-';
-                    if (newGesture !== currentLetter.textContent) {
-                        currentLetter.textContent = newGesture;
-                        currentLetter.classList.add('active');
-                        setTimeout(() => currentLetter.classList.remove('active'), 1000);
-                    }
-                    currentTimestamp.textContent = gestureData.timestamp;
+                    showGesture(gestureData.gesture, gestureData.timestamp);
                     
                     // Get history
                     const historyResponse = await fetch('/get_gesture_history');
@@ -922,6 +3184,7 @@ HTML_TEMPLATE = '''
 
         // Check server health on page load
         window.addEventListener('load', async () => {
+            connectSocket();
             try {
                 const response = await fetch('/health');
                 const data = await response.json();
@@ -957,8 +3220,15 @@ if __name__ == '__main__':
         print("🎯 Ready for NGO demonstrations and accessibility assistance!")
         print("")
         
-        # Use regular Flask development server for better compatibility
-        app.run(debug=True, host='0.0.0.0', port=5000, threaded=True)
+        # With debug=True the reloader re-runs this file in a child process
+        # that does the serving, so only that one needs warm graphs
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            warm_up_hands()
+            if HISTORY_DIR:
+                prune_gesture_logs(HISTORY_DIR)
+        
+        # Werkzeug development server (threading mode) for better compatibility
+        socketio.run(app, debug=True, host='0.0.0.0', port=5000, allow_unsafe_werkzeug=True)
         
     except Exception as e:
         print(f"❌ Error starting server: {e}")
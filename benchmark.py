@@ -0,0 +1,553 @@
+"""
+Benchmarks for the Sign Language Translator
+
+Measures the gesture recognition engine and the frame path from app.py
+without a webcam, using the fixtures in fixtures/:
+
+    landmarks.npz   random (x, y) point clouds of 21 landmarks, keyed by the
+                    letter persons_input gave them when they were made (in
+                    "compat" feature mode). They exercise the classifiers
+                    but are not shaped like real hands.
+    signing.avi     a drawn hand moving across the frame and leaving it
+
+Results can be written as JSON and compared against a stored baseline,
+which makes the run fail when something got slower than the tolerance.
+
+Usage:
+    python benchmark.py                               # every benchmark
+    python benchmark.py classifier jpeg               # some of them
+    python benchmark.py parity                        # float vs compat features
+    python benchmark.py learned                       # LandmarkClassifier
+    python benchmark.py --json results.json
+    python benchmark.py --save-baseline baseline.json
+    python benchmark.py --baseline baseline.json --tolerance 0.25
+    python benchmark.py --allocations --frames 50
+    python benchmark.py --make-fixtures
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import cv2 as cv
+import numpy as np
+
+import app
+from app import persons_input, classify_batch, LandmarkClassifier, VideoCamera, FramePipeline
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+LANDMARKS_FIXTURE = os.path.join(FIXTURES, 'landmarks.npz')
+VIDEO_FIXTURE = os.path.join(FIXTURES, 'signing.avi')
+CHART = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alphabet-numbers-American-Sign-Language.webp')
+
+def synthetic_hands(count, seed=0):
+    """
+    Random landmark sets: 21 points scattered uniformly up to 200 px around
+    a wrist, not shaped like a hand, returned as an (count, 21, 3) array of
+    [idx, x, y] like get_frame builds
+    """
+    rng = np.random.default_rng(seed)
+    wrist = rng.integers(100, 500, (count, 1, 2))
+    points = wrist + rng.integers(-200, 200, (count, 21, 2))
+    points[:, 0] = wrist[:, 0]
+    index = np.broadcast_to(np.arange(21)[np.newaxis, :, np.newaxis], (count, 21, 1))
+    return np.concatenate([index, points], axis=2)
+
+def letter_samples(per_letter, seed=0):
+    """
+    Group synthetic hands by the letter persons_input gives them, keeping at
+    most per_letter hands for every letter (and for the unrecognised "")
+    """
+    samples = {}
+    hands = synthetic_hands(per_letter * 400, seed)
+    for hand in hands:
+        letter = persons_input(hand, mode='compat').strip()
+        bucket = samples.setdefault(letter, [])
+        if len(bucket) < per_letter:
+            bucket.append(hand)
+    return {letter: np.array(bucket) for letter, bucket in sorted(samples.items())}
+
+def load_landmarks():
+    """{letter: (N, 21, 3) [idx, x, y] hands} from the landmark fixture"""
+    index = np.arange(21)[np.newaxis, :, np.newaxis]
+    with np.load(LANDMARKS_FIXTURE) as fixture:
+        return {
+            ('' if key == 'none' else key): np.concatenate(
+                [np.broadcast_to(index, (len(fixture[key]), 21, 1)), fixture[key]], axis=2)
+            for key in sorted(fixture.files)
+        }
+
+def load_video(path=VIDEO_FIXTURE):
+    video = cv.VideoCapture(path)
+    frames = []
+    while True:
+        success, image = video.read()
+        if not success:
+            break
+        frames.append(image)
+    video.release()
+    if not frames:
+        raise SystemExit(f"Could not read {path}, run with --make-fixtures")
+    return frames
+
+def make_fixtures(per_letter=32, seed=0):
+    """Regenerate fixtures/: landmark sets from letter_samples, video from the ASL chart"""
+    os.makedirs(FIXTURES, exist_ok=True)
+    samples = letter_samples(per_letter, seed)
+    np.savez_compressed(LANDMARKS_FIXTURE, **{
+        (letter or 'none'): hands[:, :, 1:].astype(np.int16) for letter, hands in samples.items()
+    })
+    
+    # The "A"-like sign in the chart's first row, big enough for MediaPipe to
+    # track, drifting left to right and then leaving the frame
+    chart = cv.imread(CHART)
+    chart_h, chart_w = chart.shape[:2]
+    hand = cv.resize(chart[:chart_h // 4, 3 * chart_w // 9:4 * chart_w // 9], None,
+                     fx=4, fy=4, interpolation=cv.INTER_CUBIC)
+    hand_h, hand_w = hand.shape[:2]
+    writer = cv.VideoWriter(VIDEO_FIXTURE, cv.VideoWriter_fourcc(*'MJPG'), 15, (640, 480))
+    writer.set(cv.VIDEOWRITER_PROP_QUALITY, 60)
+    for i in range(45):
+        frame = np.full((480, 640, 3), 255, np.uint8)
+        if i < 36:
+            x = (640 - hand_w) * i // 35
+            y = 470 - hand_h - int(40 * abs(np.sin(i / 6)))
+            frame[y:y + hand_h, x:x + hand_w] = hand
+        writer.write(frame)
+    writer.release()
+    print(f"Wrote {LANDMARKS_FIXTURE} ({sum(len(h) for h in samples.values())} hands, "
+          f"{len(samples)} letters) and {VIDEO_FIXTURE}")
+
+def percentiles(samples_ms):
+    return {
+        'mean_ms': round(float(np.mean(samples_ms)), 3),
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(samples_ms, 95)), 3)
+    }
+
+def bench_classifier(samples, repeat):
+    """
+    Per-letter throughput of persons_input and classify_batch in the
+    FEATURE_MODE the app runs with. Mismatches are checked in "compat" mode,
+    the one the fixture letters come from.
+    """
+    print(f"{'letter':>6} {'hands':>6} {'persons_input':>16} {'classify_batch':>16}")
+    letters = {}
+    mismatches = 0
+    total_hands = scalar_total = batch_total = 0
+    for letter, hands in samples.items():
+        mismatches += sum(persons_input(hand, mode='compat').strip() != letter for hand in hands)
+        
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for hand in hands:
+                persons_input(hand)
+        scalar = time.perf_counter() - start
+        
+        points = hands[:, :, 1:]
+        start = time.perf_counter()
+        for _ in range(repeat):
+            classify_batch(points)
+        batch = time.perf_counter() - start
+        
+        calls = repeat * len(hands)
+        letters[letter or '-'] = {
+            'persons_input_ops_per_s': round(calls / scalar),
+            'classify_batch_ops_per_s': round(calls / batch)
+        }
+        total_hands += calls
+        scalar_total += scalar
+        batch_total += batch
+        print(f"{letter or '-':>6} {len(hands):>6} {calls / scalar:>12.0f}/s {calls / batch:>12.0f}/s")
+    
+    return {
+        'persons_input_ops_per_s': round(total_hands / scalar_total),
+        'classify_batch_ops_per_s': round(total_hands / batch_total),
+        # Hands whose letter differs from the one recorded in the fixture
+        'mismatches': int(mismatches),
+        'letters': letters
+    }
+
+def bench_parity(samples, repeat, scales=(0.25, 0.5, 2.0, 4.0)):
+    """
+    Parity report. classify_batch must give the letter persons_input gives
+    in both feature modes, checked on the fixture and on fresh synthetic
+    hands. Then float features against the original integer distances:
+    fixture hands that get another letter, hands whose letter changes when
+    the same hand is seen at another scale (camera resolution or distance),
+    and the cost of persons_input in both modes.
+    """
+    hands = np.concatenate(list(samples.values()))
+    points = hands[:, :, 1:].astype(np.float64)
+    compat = [letter.strip() for letter in classify_batch(points, mode='compat')]
+    floats = [letter.strip() for letter in classify_batch(points, mode='float')]
+    
+    checked = np.concatenate([hands, synthetic_hands(5000, seed=2)])
+    batch_mismatches = {}
+    for mode in ('compat', 'float'):
+        batch = classify_batch(checked[:, :, 1:], mode=mode)
+        batch_mismatches[mode] = int(sum(persons_input(hand, mode=mode) != letter
+                                         for hand, letter in zip(checked, batch)))
+    print(f"classify_batch vs persons_input on {len(checked)} hands: "
+          f"{batch_mismatches['compat']} mismatches compat, {batch_mismatches['float']} float")
+    
+    changed = {}
+    for old, new in zip(compat, floats):
+        if old != new:
+            key = f"{old or '-'}->{new or '-'}"
+            changed[key] = changed.get(key, 0) + 1
+    print(f"{len(hands) - sum(changed.values())}/{len(hands)} fixture hands get the same letter in both modes")
+    for key, count in sorted(changed.items(), key=lambda item: -item[1]):
+        print(f"  {key:>8} {count:>5}")
+    
+    # Scaled hands reach compat mode truncated to pixels, as from classify_results
+    unstable = {'compat': {}, 'float': {}}
+    print(f"{'scale':>6} {'compat changes':>15} {'float changes':>15}")
+    for scale in scales:
+        scaled = points * scale
+        compat_scaled = [letter.strip() for letter in classify_batch(np.trunc(scaled), mode='compat')]
+        float_scaled = [letter.strip() for letter in classify_batch(scaled, mode='float')]
+        unstable['compat'][str(scale)] = sum(a != b for a, b in zip(compat, compat_scaled))
+        unstable['float'][str(scale)] = sum(a != b for a, b in zip(floats, float_scaled))
+        print(f"{scale:>6} {unstable['compat'][str(scale)]:>15} {unstable['float'][str(scale)]:>15}")
+    
+    rates = {}
+    for mode in ('compat', 'float'):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for hand in hands:
+                persons_input(hand, mode=mode)
+        rates[mode] = repeat * len(hands) / (time.perf_counter() - start)
+    print(f"persons_input: {rates['compat']:.0f}/s compat, {rates['float']:.0f}/s float")
+    
+    return {
+        'hands': len(hands),
+        'changed': sum(changed.values()),
+        'changed_letters': changed,
+        'scale_changes': unstable,
+        # Hands where persons_input and classify_batch disagree, per mode
+        'batch_mismatches': batch_mismatches,
+        'mismatches': sum(batch_mismatches.values()),
+        'compat_ops_per_s': round(rates['compat']),
+        'float_ops_per_s': round(rates['float'])
+    }
+
+def bench_learned(samples, repeat, per_letter=200, epochs=100):
+    """
+    LandmarkClassifier trained on fresh synthetic hands labelled by the rule
+    engine: how often it agrees with the fixture letters, and its cost for
+    a single hand and per hand in a batch
+    """
+    training = letter_samples(per_letter, seed=1)
+    landmarks = np.concatenate([hands[:, :, 1:] for hands in training.values()])
+    letters = [letter for letter, hands in training.items() for _ in hands]
+    start = time.perf_counter()
+    model = LandmarkClassifier.train(landmarks, letters, epochs=epochs)
+    training_s = time.perf_counter() - start
+    
+    hands = np.concatenate([hands[:, :, 1:] for hands in samples.values()])
+    expected = [letter for letter, letter_hands in samples.items() for _ in letter_hands]
+    agreement = np.mean([a.strip() == b for a, b in zip(model.classify(hands), expected)])
+    
+    single = []
+    for hand in hands[:200]:
+        start = time.perf_counter()
+        model.classify(hand[np.newaxis])
+        single.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        model.classify(hands)
+    batch = repeat * len(hands) / (time.perf_counter() - start)
+    
+    single = percentiles(single)
+    print(f"trained on {len(letters)} hands in {training_s:.1f}s, "
+          f"{agreement:.1%} agree with the fixture letters")
+    print(f"single hand {single['mean_ms']:.3f} ms mean, {single['p95_ms']:.3f} ms p95; batch {batch:.0f} hands/s")
+    return {
+        'training_s': round(training_s, 2),
+        'agreement': round(float(agreement), 3),
+        'single_hand': single,
+        'batch_hands_per_s': round(batch)
+    }
+
+class SyntheticCapture:
+    """Stands in for cv.VideoCapture, returning a fresh copy of one frame"""
+    def __init__(self, width=640, height=480, seed=0):
+        rng = np.random.default_rng(seed)
+        self.frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    
+    def isOpened(self):
+        return True
+    
+    def read(self):
+        return True, self.frame.copy()
+    
+    def release(self):
+        pass
+
+class FixtureCapture:
+    """Stands in for cv.VideoCapture, looping over decoded fixture frames as fast as asked"""
+    def __init__(self, frames):
+        self.frames = frames
+        self.position = 0
+    
+    def isOpened(self):
+        return True
+    
+    def read(self):
+        image = self.frames[self.position % len(self.frames)]
+        self.position += 1
+        return True, image.copy()
+    
+    def release(self):
+        pass
+
+def fixture_camera(frames):
+    return VideoCamera(source=FixtureCapture(frames))
+
+def bench_frame(frames, loops):
+    """End-to-end latency of one frame through every get_frame stage, MediaPipe included"""
+    camera = fixture_camera(frames)
+    camera.get_frame()  # warm up buffers and MediaPipe
+    stages = {stage: [] for stage in ('read', 'detect', 'classify', 'annotate', 'total')}
+    detected = 0
+    for _ in range(loops * len(frames)):
+        began = time.perf_counter()
+        image = camera.read()
+        read = time.perf_counter()
+        results = camera.detect(image)
+        detect = time.perf_counter()
+        gesture, hands = camera.classify(image, results)
+        classify = time.perf_counter()
+        camera.annotate(image, hands, gesture)
+        annotate = time.perf_counter()
+        for stage, start, end in (('read', began, read), ('detect', read, detect),
+                                  ('classify', detect, classify), ('annotate', classify, annotate),
+                                  ('total', began, annotate)):
+            stages[stage].append((end - start) * 1000)
+        detected += bool(hands)
+    camera.close()
+    
+    result = {stage: percentiles(samples) for stage, samples in stages.items()}
+    result['hand_frames'] = detected
+    result['frames'] = len(stages['total'])
+    total = result['total']
+    print(f"get_frame: {total['mean_ms']:.2f} ms mean, {total['p50_ms']:.2f} ms p50, "
+          f"{total['p95_ms']:.2f} ms p95 ({detected}/{result['frames']} frames with a hand)")
+    return result
+
+def bench_jpeg(frames, repeat):
+    """imencode cost and size at the default and degraded quality, full and half size"""
+    result = {}
+    for width, height in ((640, 480), (320, 240)):
+        images = [cv.resize(image, (width, height), interpolation=cv.INTER_AREA) for image in frames]
+        for quality in (app.JPEG_QUALITY, app.DEGRADED_JPEG_QUALITY):
+            times = []
+            size = 0
+            for _ in range(repeat):
+                for image in images:
+                    start = time.perf_counter()
+                    ret, buffer = cv.imencode('.jpg', image, (cv.IMWRITE_JPEG_QUALITY, quality))
+                    times.append((time.perf_counter() - start) * 1000)
+                    size += len(buffer)
+            key = f"{width}x{height}_q{quality}"
+            result[key] = percentiles(times)
+            result[key]['bytes'] = size // len(times)
+            print(f"jpeg {key}: {result[key]['mean_ms']:.2f} ms, {result[key]['bytes']} bytes")
+    return result
+
+def bench_stream(frames, seconds):
+    """
+    MJPEG throughput of /video_feed with the fixture as a camera that never
+    makes the pipeline wait, paced far above any real frame rate. Fails if
+    /video_feed serves the "Camera not available" frame instead.
+    """
+    client = app.app.test_client()
+    client.get('/')
+    # The session /video_feed resolves to, which is the shared camera
+    # session when SHARED_CAMERA is on
+    session_id = client.get('/health').get_json()['session']
+    translator_session = app.session_manager.get(session_id)
+    translator_session.camera = fixture_camera(frames)
+    translator_session.is_camera_active = True
+    translator_session.pipeline = FramePipeline(translator_session.camera,
+                                                on_result=translator_session.record_hands,
+                                                target_fps=1000)
+    translator_session.pipeline.start()
+    
+    unavailable = bytes(app.unavailable_frame())
+    response = client.get('/video_feed')
+    try:
+        chunks = iter(response.response)
+        next(chunks)
+        count = size = placeholders = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            chunk = next(chunks)
+            size += len(chunk)
+            count += 1
+            placeholders += unavailable in chunk
+        elapsed = time.perf_counter() - start
+        stats = translator_session.pipeline.stats()
+    finally:
+        response.close()
+        app.session_manager.remove(session_id)
+    if placeholders:
+        raise RuntimeError(f"/video_feed served {placeholders} of {count} frames as \"Camera not available\" "
+                           f"instead of the fixture")
+    
+    result = {
+        'fps': round(count / elapsed, 1),
+        'mb_per_s': round(size / elapsed / 1e6, 2),
+        'frames': count,
+        'dropped': stats['dropped'],
+        # Pacing is far above what inference keeps up with, so this is
+        # the throughput after the pipeline degraded itself
+        'degradation': stats['pacing']['degradation']
+    }
+    print(f"stream: {result['fps']} fps, {result['mb_per_s']} MB/s")
+    return result
+
+def bench_frame_allocations(frames, width, height):
+    """Peak bytes allocated while VideoCamera.get_frame handles one frame"""
+    camera = VideoCamera(source=SyntheticCapture(width, height))
+    camera.get_frame()  # warm up buffers and MediaPipe
+    
+    peaks = []
+    tracemalloc.start()
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        camera.get_frame()
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    camera.close()
+    
+    frame_bytes = width * height * 3
+    print(f"get_frame at {width}x{height} ({frame_bytes} bytes per frame buffer)")
+    print(f"  peak allocated per frame: median {int(np.median(peaks))} bytes, "
+          f"max {max(peaks)} bytes ({np.median(peaks) / frame_bytes:.2f} frame buffers)")
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[prefix + key] = value
+    return flat
+
+def compare(results, baseline, tolerance):
+    """
+    Regressions against a baseline run: mean and median timings that grew
+    and rates (_per_s, fps) that fell by more than tolerance, and any new
+    mismatches. p95 is reported but too noisy over short runs to judge by.
+    """
+    current, previous = flatten(results), flatten(baseline)
+    regressions = []
+    for key, old in sorted(previous.items()):
+        new = current.get(key)
+        if new is None or '.letters.' in key:
+            continue
+        if key.endswith('mismatches'):
+            worse = new > old
+        elif key.endswith(('mean_ms', 'p50_ms')):
+            worse = new > old * (1 + tolerance)
+        elif key.endswith(('_per_s', 'fps')):
+            worse = new < old * (1 - tolerance)
+        else:
+            continue
+        if worse:
+            regressions.append(f"{key}: {old} -> {new}")
+    return regressions
+
+BENCHMARKS = ('classifier', 'parity', 'learned', 'frame', 'jpeg', 'stream')
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the gesture recognition engine and frame path")
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help=f"any of {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('--repeat', type=int, default=10, help="timing repetitions")
+    parser.add_argument('--loops', type=int, default=2, help="passes over the fixture video")
+    parser.add_argument('--seconds', type=float, default=5.0, help="duration of the stream benchmark")
+    parser.add_argument('--json', help="write results to this file ('-' for stdout)")
+    parser.add_argument('--baseline', help="compare against results saved with --save-baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown against the baseline")
+    parser.add_argument('--save-baseline', help="write results as the new baseline")
+    parser.add_argument('--make-fixtures', action='store_true', help="regenerate fixtures/")
+    parser.add_argument('--allocations', action='store_true', help="measure get_frame allocations")
+    parser.add_argument('--frames', type=int, default=30, help="frames for --allocations")
+    parser.add_argument('--width', type=int, default=640)
+    parser.add_argument('--height', type=int, default=480)
+    args = parser.parse_args()
+    
+    if args.make_fixtures:
+        make_fixtures()
+        return 0
+    if args.allocations:
+        bench_frame_allocations(args.frames, args.width, args.height)
+        return 0
+    
+    selected = args.benchmarks or BENCHMARKS
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(sorted(unknown))}")
+    results = {}
+    status = 0
+    frames = load_video() if set(selected) & {'frame', 'jpeg', 'stream'} else None
+    if 'classifier' in selected:
+        results['classifier'] = bench_classifier(load_landmarks(), args.repeat)
+    if 'parity' in selected:
+        results['parity'] = bench_parity(load_landmarks(), args.repeat)
+        if results['parity']['mismatches']:
+            print("classify_batch no longer matches persons_input", file=sys.stderr)
+            status = 1
+    if 'learned' in selected:
+        results['learned'] = bench_learned(load_landmarks(), args.repeat)
+    if 'frame' in selected:
+        results['frame'] = bench_frame(frames, args.loops)
+    if 'jpeg' in selected:
+        results['jpeg'] = bench_jpeg(frames, args.repeat)
+    if 'stream' in selected:
+        results['stream'] = bench_stream(frames, args.seconds)
+    
+    report = {
+        'machine': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'opencv': cv.__version__,
+            'numpy': np.__version__
+        },
+        'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'results': results
+    }
+    if args.json:
+        text = json.dumps(report, indent=2)
+        if args.json == '-':
+            print(text)
+        else:
+            with open(args.json, 'w') as output:
+                output.write(text + '\n')
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as output:
+            json.dump(report, output, indent=2)
+    
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline['results'], args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions against {args.baseline}:", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
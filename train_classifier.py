@@ -0,0 +1,114 @@
+"""
+Train the learned letter classifier
+
+Collects labelled hands and trains the LandmarkClassifier that app.py uses
+with CLASSIFIER=learned. Hands come from:
+
+    directories     gesture logs (HISTORY_DIR or one session's directory),
+                    every .jsonl file below them
+    .jsonl files    one JSON object per line with "landmarks" and a "gesture"
+                    or "letter", e.g. transcribe.py --landmarks --format jsonl
+                    output, which can be corrected by hand before training
+    .npz files      {letter: (N, 21, 2) landmarks} like fixtures/landmarks.npz
+                    ("none" holding hands without a letter)
+
+Usage:
+    python train_classifier.py gesture_logs/ -o gesture_model.npz
+    python train_classifier.py corrected.jsonl fixtures/landmarks.npz --holdout 0.2
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from app import LandmarkClassifier, CLASSIFIER_MODEL, CLASSIFIER_MIN_CONFIDENCE
+
+def read_jsonl(path):
+    """(landmarks, letter) of every entry in a JSON-lines file that has both"""
+    samples = []
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # torn last line of a log
+            landmarks = entry.get('landmarks')
+            letter = entry.get('letter', entry.get('gesture'))
+            if landmarks is None or letter is None:
+                continue
+            # Older logs stored [idx, x, y] rows
+            samples.append((np.array(landmarks, dtype=np.float64)[:, -2:], letter.strip()))
+    return samples
+
+def read_samples(paths):
+    """(N, 21, 2) landmarks and N letters from all inputs"""
+    samples = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                for name in sorted(files):
+                    if name.endswith('.jsonl'):
+                        samples.extend(read_jsonl(os.path.join(root, name)))
+        elif path.endswith('.npz'):
+            with np.load(path) as hands:
+                for key in hands.files:
+                    letter = '' if key == 'none' else key
+                    samples.extend((hand[:, -2:], letter) for hand in hands[key])
+        else:
+            samples.extend(read_jsonl(path))
+    samples = [(landmarks, letter) for landmarks, letter in samples if len(landmarks) == 21]
+    if not samples:
+        return np.empty((0, 21, 2)), []
+    return np.array([landmarks for landmarks, _ in samples], dtype=np.float64), [letter for _, letter in samples]
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the learned letter classifier from recorded hands")
+    parser.add_argument('inputs', nargs='+', help="gesture log directories, .jsonl or .npz files")
+    parser.add_argument('-o', '--output', default=CLASSIFIER_MODEL, help=f"model file (default: {CLASSIFIER_MODEL})")
+    parser.add_argument('--hidden', type=int, default=64, help="hidden layer size")
+    parser.add_argument('--epochs', type=int, default=200)
+    parser.add_argument('--holdout', type=float, default=0.0, help="fraction of hands kept back to measure accuracy")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    landmarks, letters = read_samples(args.inputs)
+    if not letters:
+        print("No labelled hands found", file=sys.stderr)
+        return 1
+    counts = {letter: letters.count(letter) for letter in sorted(set(letters))}
+    print(f"{len(letters)} hands: " + ', '.join(f"{letter or '-'} {count}" for letter, count in counts.items()))
+
+    order = np.random.default_rng(args.seed).permutation(len(letters))
+    held = order[:int(len(order) * args.holdout)]
+    train = order[len(held):]
+    began = time.perf_counter()
+    model = LandmarkClassifier.train(landmarks[train], [letters[i] for i in train], hidden=args.hidden,
+                                     epochs=args.epochs, seed=args.seed,
+                                     min_confidence=CLASSIFIER_MIN_CONFIDENCE)
+    print(f"Trained on {len(train)} hands in {time.perf_counter() - began:.1f}s")
+
+    if len(held):
+        predicted = [letter.strip() for letter in model.classify(landmarks[held])]
+        expected = [letters[i] for i in held]
+        print(f"Held-out accuracy: {np.mean([a == b for a, b in zip(predicted, expected)]):.1%} of {len(held)} hands")
+        for letter in sorted(set(expected)):
+            matches = [a == b for a, b in zip(predicted, expected) if b == letter]
+            print(f"  {letter or '-':>3} {np.mean(matches):>7.1%} of {len(matches)}")
+
+    hand = landmarks[:1]
+    calls = 1000
+    began = time.perf_counter()
+    for _ in range(calls):
+        model.classify(hand)
+    print(f"Inference: {(time.perf_counter() - began) * 1000 / calls:.3f} ms per single hand")
+
+    model.save(args.output)
+    print(f"Wrote {args.output}, use it with CLASSIFIER=learned CLASSIFIER_MODEL={args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Offline transcription of recorded signing
+
+Runs video files and image directories through the same MediaPipe +
+persons_input path as the web app and writes a per-frame letter track.
+Frames are split into segments that are shared out over a process pool,
+each worker process keeping its own MediaPipe Hands graph.
+
+Usage:
+    python transcribe.py session1.mp4 session2.mp4 -o letters.csv
+    python transcribe.py frames_dir/ --format jsonl --workers 8 --landmarks
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import cv2 as cv
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+FIELDS = ['source', 'frame', 'time', 'letter']
+
+# Per-process state, set up once by init_worker
+worker_hands = None
+worker_tracking = False
+
+def init_worker(static_image_mode):
+    global worker_hands, worker_tracking
+    from app import mp_hands
+    worker_tracking = not static_image_mode
+    worker_hands = mp_hands.Hands(
+        static_image_mode=static_image_mode,
+        max_num_hands=1,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+def plan_segments(paths, segment_frames):
+    """
+    Split every input into (source, kind, start, items) work units: frame
+    ranges of a video, or slices of the sorted image files of a directory.
+    Videos whose container gives no frame count are one unit, read to the
+    end (items None).
+    """
+    segments = []
+    for path in paths:
+        if os.path.isdir(path):
+            images = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+            for start in range(0, len(images), segment_frames):
+                segments.append((path, 'images', start, images[start:start + segment_frames]))
+        else:
+            video = cv.VideoCapture(path)
+            if not video.isOpened():
+                print(f"Warning: Could not open {path}, skipping", file=sys.stderr)
+                continue
+            frame_count = int(video.get(cv.CAP_PROP_FRAME_COUNT))
+            video.release()
+            if frame_count <= 0:
+                segments.append((path, 'video', 0, None))
+                continue
+            for start in range(0, frame_count, segment_frames):
+                segments.append((path, 'video', start, min(segment_frames, frame_count - start)))
+    return segments
+
+def read_segment(kind, source, start, items):
+    """Yield (frame_index, fps, BGR image) for one work unit"""
+    if kind == 'images':
+        for offset, image_path in enumerate(items):
+            image = cv.imread(image_path)
+            if image is not None:
+                yield start + offset, None, image
+        return
+
+    video = cv.VideoCapture(source)
+    fps = video.get(cv.CAP_PROP_FPS) or None
+    video.set(cv.CAP_PROP_POS_FRAMES, start)
+    for offset in (itertools.count() if items is None else range(items)):
+        success, image = video.read()
+        if not success:
+            break
+        yield start + offset, fps, image
+    video.release()
+
+def transcribe_segment(segment):
+    """Worker: letter rows for one segment plus (pid, frames, seconds)"""
+    from app import classify_results, HandsPool
+
+    source, kind, start, items = segment
+    began = time.perf_counter()
+    if worker_tracking:
+        # An empty frame drops the hand tracked in the worker's previous
+        # segment, which may be from another part or another video
+        worker_hands.process(HandsPool.blank_frame())
+    rows = []
+    for frame_index, fps, image in read_segment(kind, source, start, items):
+        rgb_image = cv.cvtColor(image, cv.COLOR_BGR2RGB)
+        rgb_image.flags.writeable = False
+        results = worker_hands.process(rgb_image)
+        img_h, img_w = image.shape[:2]
+        gesture, hands = classify_results(results, img_w, img_h)
+        rows.append({
+            'source': source,
+            'frame': frame_index,
+            'time': round(frame_index / fps, 3) if fps else None,
+            'letter': gesture,
+            'landmarks': hands[-1][1][:, 1:].tolist() if hands else None
+        })
+    return rows, (os.getpid(), len(rows), time.perf_counter() - began)
+
+def write_rows(rows, output, output_format, writer, landmarks):
+    for row in rows:
+        if not landmarks:
+            row.pop('landmarks')
+        if output_format == 'jsonl':
+            output.write(json.dumps(row) + '\n')
+        else:
+            if landmarks:
+                row['landmarks'] = json.dumps(row['landmarks'])
+            writer.writerow(row)
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe recorded signing to a per-frame letter track")
+    parser.add_argument('inputs', nargs='+', help="video files or directories of images")
+    parser.add_argument('-o', '--output', help="output file (default: stdout)")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="default: from the output extension, else csv")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--segment', type=int, default=300, help="frames per work unit")
+    parser.add_argument('--static', action='store_true',
+                        help="run MediaPipe in static image mode (no tracking between frames)")
+    parser.add_argument('--landmarks', action='store_true', help="include the 21 (x, y) landmarks")
+    args = parser.parse_args()
+
+    output_format = args.format or ('jsonl' if args.output and args.output.endswith('.jsonl') else 'csv')
+    segments = plan_segments(args.inputs, args.segment)
+    if not segments:
+        print("Nothing to transcribe", file=sys.stderr)
+        return 1
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    writer = None
+    if output_format == 'csv':
+        writer = csv.DictWriter(output, FIELDS + (['landmarks'] if args.landmarks else []))
+        writer.writeheader()
+
+    workers = {}
+    began = time.perf_counter()
+    with multiprocessing.Pool(args.workers, initializer=init_worker, initargs=(args.static,)) as pool:
+        # imap keeps segments in input order while later ones are still running
+        for rows, (pid, frames, seconds) in pool.imap(transcribe_segment, segments):
+            write_rows(rows, output, output_format, writer, args.landmarks)
+            worker_frames, worker_seconds = workers.get(pid, (0, 0.0))
+            workers[pid] = (worker_frames + frames, worker_seconds + seconds)
+    elapsed = time.perf_counter() - began
+
+    if output is not sys.stdout:
+        output.close()
+
+    total = sum(frames for frames, seconds in workers.values())
+    print(f"Transcribed {total} frames in {elapsed:.1f}s ({total / elapsed:.1f} fps overall)", file=sys.stderr)
+    for pid, (frames, seconds) in sorted(workers.items()):
+        print(f"  worker {pid}: {frames} frames, {frames / seconds if seconds else 0:.1f} fps", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())